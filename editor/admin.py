@@ -1,9 +1,16 @@
-from django.contrib import admin
+import os
+import tempfile
+
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.shortcuts import redirect, render
+from django.urls import path
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from .forms import TemplateBulkUploadForm
 from .models import Template, UserDesign, UserUploadedImage, TemplateCategory
+from .template_import import import_templates
 
 # Customize Admin Site Headers
 admin.site.site_header = "Forthicon Admin"
@@ -84,11 +91,58 @@ class TemplateAdmin(admin.ModelAdmin):
         }),
     )
     
+    change_list_template = 'editor/admin/template_change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('bulk-upload/', self.admin_site.admin_view(self.bulk_upload_view), name='editor_template_bulk_upload'),
+        ]
+        return urls + super().get_urls()
+
+    def bulk_upload_view(self, request):
+        """Import a ZIP of template images, one category per top-level folder"""
+        if not self.has_add_permission(request):
+            return redirect('admin:editor_template_changelist')
+
+        form = TemplateBulkUploadForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            archive = form.cleaned_data['archive']
+            # The importer reads by path, small uploads only live in memory
+            with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp:
+                for chunk in archive.chunks():
+                    tmp.write(chunk)
+            try:
+                # Never fork a request-serving worker; large batches belong to the import_templates command
+                report = import_templates(tmp.name, uploaded_by=request.user, processes=False)
+            finally:
+                os.unlink(tmp.name)
+
+            self.message_user(
+                request,
+                f'Imported {report.created} template(s) in {report.elapsed:.1f}s ({report.throughput:.1f} files/s).',
+                messages.SUCCESS,
+            )
+            for error_path, message in report.errors[:20]:
+                self.message_user(request, f'{error_path}: {message}', messages.WARNING)
+            if len(report.errors) > 20:
+                self.message_user(request, f'...and {len(report.errors) - 20} more error(s).', messages.WARNING)
+            return redirect('admin:editor_template_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Bulk upload templates',
+            'form': form,
+        }
+        return render(request, 'editor/admin/template_bulk_upload.html', context)
+
     def save_model(self, request, obj, form, change):
         if not obj.uploaded_by:
             obj.uploaded_by = request.user
         if request.user.is_staff or request.user.is_superuser:
             obj.is_admin_template = True
+        if 'image' in form.changed_data:
+            obj.read_image_dimensions()
         super().save_model(request, obj, form, change)
     
     def template_preview(self, obj):
@@ -104,9 +158,9 @@ class TemplateAdmin(admin.ModelAdmin):
     template_image_preview.short_description = 'Image Preview'
     
     def used_count(self, obj):
-        count = obj.userdesign_set.count()
-        return format_html('<span style="background: #28a745; color: white; padding: 4px 8px; border-radius: 4px;">{0}</span>', count)
+        return format_html('<span style="background: #28a745; color: white; padding: 4px 8px; border-radius: 4px;">{0}</span>', obj.use_count)
     used_count.short_description = 'Times Used'
+    used_count.admin_order_field = 'use_count'
 
 
 @admin.register(UserDesign)
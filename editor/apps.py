@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class EditorConfig(AppConfig):
     name = 'editor'
+
+    def ready(self):
+        from . import signals  # noqa: F401
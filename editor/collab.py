@@ -0,0 +1,416 @@
+"""
+Real-time collaborative editing of a UserDesign over ASGI WebSockets.
+
+Clients connect to ``/ws/designs/<design_id>/`` and exchange element-level
+operations as JSON text frames instead of posting the whole document:
+
+    server -> client   {"type": "snapshot", "connection_id": ..., "version": n, "elements": [...]}
+    client -> server   {"type": "op", "client_op_id": ..., "op": {...}}
+    server -> clients  {"type": "op", "version": n, "sender": ..., "client_op_id": ..., "op": {...}}
+    server -> client   {"type": "error", "client_op_id": ..., "error": ...}
+    client -> server   {"type": "sync"}      answered with a fresh snapshot
+
+Ops address elements by their ``id``:
+
+    {"action": "add", "element": {...}, "index": n}       index is optional
+    {"action": "update", "id": ..., "changes": {...}}
+    {"action": "remove", "id": ...}
+    {"action": "reorder", "id": ..., "index": n}
+
+Each process keeps one Room per open design. Validated ops go through the
+broker (``settings.COLLAB_BROKER``) and every subscribed room applies them in
+broker order before fanning them out to its local connections, so swapping
+the in-process broker for a shared one (Redis, NATS, ...) scales rooms
+across processes. Rooms coalesce the op stream into ``canvas_data`` every
+``COLLAB_FLUSH_SECONDS`` and when the last client leaves; a room reopened for
+the same design waits for that final flush before loading the document.
+Elements saved without ids get them written back before the first room
+opens, so every process addresses them by the same ids; legacy fields are
+stripped in the same write (see ``validators.normalize_element``). Joins are
+serialized per design, so loading one document never holds up another.
+"""
+
+import asyncio
+import contextlib
+import json
+import re
+import uuid
+import weakref
+from collections import defaultdict
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.db import transaction
+from django.http.cookie import parse_cookie
+from django.http.request import validate_host
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import UserDesign
+from .validators import CanvasValidationError, max_elements, normalize_element, validate_element
+
+PATH_RE = re.compile(r'^/ws/designs/(?P<design_id>\d+)/$')
+MAX_MESSAGE_LENGTH = 65536
+SEND_QUEUE_SIZE = 256
+
+# Application-defined WebSocket close codes
+CLOSE_NOT_FOUND = 4404
+CLOSE_FORBIDDEN = 4403
+CLOSE_TOO_SLOW = 1013
+
+
+class InMemoryBroker:
+    """
+    Single-process broker. Any replacement only needs these three coroutines
+    and must deliver each channel's messages to all subscribers in one order.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+
+    async def subscribe(self, channel, callback):
+        self._subscribers[channel].append(callback)
+
+    async def unsubscribe(self, channel, callback):
+        callbacks = self._subscribers.get(channel, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self._subscribers.pop(channel, None)
+
+    async def publish(self, channel, message):
+        for callback in list(self._subscribers.get(channel, ())):
+            callback(message)
+
+
+class Connection:
+    """One WebSocket client; outgoing frames are queued so a slow client never blocks a room"""
+
+    def __init__(self, send):
+        self.id = uuid.uuid4().hex[:12]
+        self.send = send
+        self.queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.dropped = False
+
+    def deliver(self, text):
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            # Too far behind to catch up; it gets a fresh snapshot when it reconnects
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def write_loop(self):
+        while True:
+            text = await self.queue.get()
+            if text is None:
+                await self.send({'type': 'websocket.close', 'code': CLOSE_TOO_SLOW})
+                return
+            await self.send({'type': 'websocket.send', 'text': text})
+
+
+class Room:
+    def __init__(self, design_id, elements, broker):
+        self.design_id = design_id
+        self.channel = f'editor.design.{design_id}'
+        self.elements = elements
+        self.broker = broker
+        self.version = 0
+        self.connections = set()
+        self.dirty = False
+        self._flush_task = None
+
+    async def open(self):
+        await self.broker.subscribe(self.channel, self.receive)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        await self.broker.unsubscribe(self.channel, self.receive)
+        self._flush_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._flush_task
+        await self.flush()
+
+    def snapshot(self, connection):
+        return json.dumps({
+            'type': 'snapshot',
+            'connection_id': connection.id,
+            'version': self.version,
+            'elements': self.elements,
+        })
+
+    def _find(self, element_id):
+        for index, element in enumerate(self.elements):
+            if element.get('id') == element_id:
+                return index
+        return None
+
+    def check_op(self, op):
+        """Validate an incoming op against the current document, returning the op to publish"""
+        if not isinstance(op, dict):
+            raise CanvasValidationError('op', 'must be an object')
+        action = op.get('action')
+
+        if action == 'add':
+            element = op.get('element')
+            validate_element(element, 'op.element')
+            if 'id' not in element:
+                raise CanvasValidationError('op.element.id', 'is required')
+            if self._find(element['id']) is not None:
+                raise CanvasValidationError('op.element.id', 'already exists')
+            limit = max_elements()
+            if len(self.elements) >= limit:
+                raise CanvasValidationError('op', f'a design may contain at most {limit} elements')
+            index = op.get('index')
+            if index is not None and type(index) is not int:
+                raise CanvasValidationError('op.index', 'must be an integer')
+            return {'action': 'add', 'element': element, 'index': index}
+
+        if action not in ('update', 'remove', 'reorder'):
+            raise CanvasValidationError('op.action', 'must be one of add, update, remove, reorder')
+        index = self._find(op.get('id'))
+        if index is None:
+            raise CanvasValidationError('op.id', 'no element with this id')
+
+        if action == 'update':
+            changes = op.get('changes')
+            if not isinstance(changes, dict) or not changes:
+                raise CanvasValidationError('op.changes', 'must be a non-empty object')
+            # Clients keep a loaded image per element, so a new image is a remove and an add
+            if {'id', 'type', 'image'} & changes.keys():
+                raise CanvasValidationError('op.changes', 'cannot change an element\'s id, type or image')
+            validate_element({**self.elements[index], **changes}, 'op.changes')
+            return {'action': 'update', 'id': op['id'], 'changes': changes}
+
+        if action == 'reorder':
+            if type(op.get('index')) is not int:
+                raise CanvasValidationError('op.index', 'must be an integer')
+            return {'action': 'reorder', 'id': op['id'], 'index': op['index']}
+
+        return {'action': 'remove', 'id': op['id']}
+
+    def apply_op(self, op):
+        """Apply a published op; ops made stale by a concurrent one are skipped"""
+        action = op['action']
+        if action == 'add':
+            if self._find(op['element']['id']) is not None:
+                return False
+            index = op.get('index')
+            self.elements.insert(len(self.elements) if index is None else max(0, index), op['element'])
+            return True
+
+        index = self._find(op['id'])
+        if index is None:
+            return False
+        if action == 'update':
+            # Replace rather than mutate, so a flush in progress keeps a consistent copy
+            self.elements[index] = {**self.elements[index], **op['changes']}
+        elif action == 'remove':
+            del self.elements[index]
+        elif action == 'reorder':
+            self.elements.insert(max(0, op['index']), self.elements.pop(index))
+        return True
+
+    def receive(self, message):
+        """Broker callback: apply the op and fan the encoded frame out to local clients"""
+        if not self.apply_op(message['op']):
+            return
+        self.version += 1
+        self.dirty = True
+        text = json.dumps({'type': 'op', 'version': self.version, **message})
+        for connection in list(self.connections):
+            connection.deliver(text)
+
+    async def _flush_loop(self):
+        interval = getattr(settings, 'COLLAB_FLUSH_SECONDS', 2.0)
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    async def flush(self):
+        """Coalesce every op applied since the last flush into one canvas_data write"""
+        if not self.dirty:
+            return
+        self.dirty = False
+        try:
+            await UserDesign.objects.filter(pk=self.design_id).aupdate(
+                canvas_data={'elements': list(self.elements)},
+                updated_at=timezone.now(),
+            )
+        except BaseException:
+            # Includes cancellation: the next flush must write these ops again
+            self.dirty = True
+            raise
+
+
+def load_elements(design_id):
+    """
+    Read a design's elements from the primary, first persisting ids for any
+    element saved without one (designs from before collaborative editing) and
+    dropping fields older editors stored that ops could not validate against.
+    The row lock makes concurrent first loads on other processes wait and
+    then read the same ids instead of inventing their own.
+    """
+    with transaction.atomic():
+        design = UserDesign.objects.select_for_update().only('canvas_data').get(pk=design_id)
+        canvas_data = design.canvas_data if isinstance(design.canvas_data, dict) else {}
+        stored = [element for element in canvas_data.get('elements') or [] if isinstance(element, dict)]
+        elements = [normalize_element(element) for element in stored]
+        elements = [element if element.get('id') else {**element, 'id': uuid.uuid4().hex[:12]} for element in elements]
+        if elements == stored:
+            return elements
+        # Same content, so updated_at (and with it the share image) is left alone
+        UserDesign.objects.filter(pk=design_id).update(canvas_data={**canvas_data, 'elements': elements})
+        return elements
+
+
+class RoomManager:
+    def __init__(self, broker=None):
+        self.broker = broker or import_string(getattr(settings, 'COLLAB_BROKER', 'editor.collab.InMemoryBroker'))()
+        self.rooms = {}
+        self._closing = {}  # design_id -> task running the last room's final flush
+        self._locks = weakref.WeakValueDictionary()  # design_id -> lock, kept while in use
+
+    def _lock(self, design_id):
+        lock = self._locks.get(design_id)
+        if lock is None:
+            lock = self._locks[design_id] = asyncio.Lock()
+        return lock
+
+    async def join(self, design_id, connection):
+        async with self._lock(design_id):
+            closing = self._closing.get(design_id)
+            if closing is not None and not closing.done():
+                # The last editor just left; load the document only once its edits are flushed
+                await asyncio.wait([closing])
+            room = self.rooms.get(design_id)
+            if room is None:
+                room = Room(design_id, await sync_to_async(load_elements)(design_id), self.broker)
+                await room.open()
+                self.rooms[design_id] = room
+            room.connections.add(connection)
+            connection.deliver(room.snapshot(connection))
+            return room
+
+    async def leave(self, room, connection):
+        async with self._lock(room.design_id):
+            room.connections.discard(connection)
+            if room.connections or self.rooms.get(room.design_id) is not room:
+                return
+            del self.rooms[room.design_id]
+            closing = self._closing[room.design_id] = asyncio.create_task(room.close())
+        try:
+            await closing
+        finally:
+            if self._closing.get(room.design_id) is closing:
+                del self._closing[room.design_id]
+
+
+class _ScopeRequest:
+    """Just enough of an HttpRequest for django.contrib.auth.aget_user"""
+
+    def __init__(self, session):
+        self.session = session
+
+
+async def get_scope_user(scope):
+    headers = dict(scope.get('headers', []))
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    session = import_module(settings.SESSION_ENGINE).SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+    return await aget_user(_ScopeRequest(session))
+
+
+def origin_allowed(scope):
+    """Reject cross-site WebSocket hijacking: a browser Origin must be one of ALLOWED_HOSTS"""
+    origin = dict(scope.get('headers', [])).get(b'origin')
+    if origin is None:
+        return True
+    hostname = urlsplit(origin.decode('latin-1')).hostname
+    return bool(hostname) and validate_host(hostname, settings.ALLOWED_HOSTS)
+
+
+async def can_edit(user, design_id):
+    designs = UserDesign.objects.filter(pk=design_id)
+    if not user.is_staff:
+        designs = designs.filter(user=user)
+    return await designs.aexists()
+
+
+class CollaborationConsumer:
+    """ASGI application for the ``websocket`` scope type"""
+
+    def __init__(self, manager=None):
+        self._manager = manager
+
+    @property
+    def manager(self):
+        # Created lazily so rooms and their locks belong to the server's event loop
+        if self._manager is None:
+            self._manager = RoomManager()
+        return self._manager
+
+    async def __call__(self, scope, receive, send):
+        message = await receive()
+        if message['type'] != 'websocket.connect':
+            return
+
+        match = PATH_RE.match(scope['path'])
+        if match is None:
+            await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+            return
+        design_id = int(match['design_id'])
+        user = await get_scope_user(scope)
+        if not origin_allowed(scope) or not user.is_authenticated or not await can_edit(user, design_id):
+            await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+            return
+
+        await send({'type': 'websocket.accept'})
+        connection = Connection(send)
+        room = await self.manager.join(design_id, connection)
+        writer = asyncio.create_task(connection.write_loop())
+        try:
+            while not connection.dropped:
+                message = await receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                if message['type'] == 'websocket.receive':
+                    await self.handle_text(room, connection, message.get('text'))
+        finally:
+            await self.manager.leave(room, connection)
+            if not connection.dropped:
+                writer.cancel()
+
+    async def handle_text(self, room, connection, text):
+        try:
+            if text is None or len(text) > MAX_MESSAGE_LENGTH:
+                raise ValueError
+            data = json.loads(text)
+            client_op_id = data.get('client_op_id')
+        except (ValueError, AttributeError):
+            connection.deliver(json.dumps({'type': 'error', 'error': 'Frames must be JSON objects under 64 KB'}))
+            return
+
+        if data.get('type') == 'ping':
+            connection.deliver(json.dumps({'type': 'pong'}))
+            return
+        if data.get('type') == 'sync':
+            # Lets a client roll back to the room's state after a rejected op
+            connection.deliver(room.snapshot(connection))
+            return
+        if data.get('type') != 'op':
+            connection.deliver(json.dumps({'type': 'error', 'client_op_id': client_op_id, 'error': 'Unknown message type'}))
+            return
+
+        try:
+            op = room.check_op(data.get('op'))
+        except CanvasValidationError as e:
+            connection.deliver(json.dumps({'type': 'error', 'client_op_id': client_op_id, 'error': str(e)}))
+            return
+        await room.broker.publish(room.channel, {'sender': connection.id, 'client_op_id': client_op_id, 'op': op})
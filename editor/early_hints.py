@@ -0,0 +1,76 @@
+"""
+ASGI middleware that sends HTTP 103 Early Hints for pages that declare preloads.
+
+Django cannot emit an informational response while a view is still running, so
+this middleware remembers the ``Link`` header a page returned last time and
+replays it as Early Hints on the next request for the same path, before the
+view starts its database work. Only servers that advertise the
+``http.response.early_hint`` ASGI extension (e.g. Hypercorn) receive hints.
+
+The editor pages are login-only, so hints are only replayed to requests that
+carry a session cookie: an anonymous visitor goes straight to the login
+redirect without preloading the page's assets. Hints are learned from 200
+responses only, so redirects and errors neither store nor evict them.
+"""
+
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http.cookie import parse_cookie
+
+EARLY_HINT_EXTENSION = 'http.response.early_hint'
+
+
+class EarlyHintsMiddleware:
+    """Replay the last ``Link`` header seen for a path as 103 Early Hints"""
+
+    def __init__(self, app, max_paths=1024):
+        self.app = app
+        self.max_paths = max_paths
+        self._links = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope['type'] != 'http'
+            or scope.get('method') != 'GET'
+            or EARLY_HINT_EXTENSION not in scope.get('extensions', {})
+            or not self._has_session(scope)
+        ):
+            return await self.app(scope, receive, send)
+
+        path = scope['path']
+        links = self._links.get(path)
+        if links:
+            await send({'type': EARLY_HINT_EXTENSION, 'links': links})
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                self._remember(path, message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _has_session(scope):
+        for name, value in scope.get('headers', []):
+            if name == b'cookie' and parse_cookie(value.decode('latin-1')).get(settings.SESSION_COOKIE_NAME):
+                return True
+        return False
+
+    def _remember(self, path, message):
+        if message['status'] != 200:
+            return
+
+        links = []
+        for name, value in message.get('headers', []):
+            if name.lower() == b'link':
+                links.extend(link.strip() for link in value.split(b',') if link.strip())
+
+        if not links:
+            self._links.pop(path, None)
+            return
+
+        self._links[path] = links
+        self._links.move_to_end(path)
+        while len(self._links) > self.max_paths:
+            self._links.popitem(last=False)
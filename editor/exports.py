@@ -0,0 +1,262 @@
+"""
+Streaming NDJSON export and batched import of UserDesign rows.
+
+Exports walk the queryset with ``.iterator(chunk_size=...)`` and yield one
+JSON line per design, optionally wrapped in a streamed ``.tar.gz`` together
+with the media each design references. Imports read the same format line by
+line and ``bulk_create`` designs in fixed-size batches, so memory use does
+not grow with the number of designs in either direction.
+
+Imports are idempotent: each record carries the design's ``export_key`` and
+records whose key the target user already has are skipped. Primary keys are
+never reused. ``id`` is informational, and a design is linked to the target's
+template with the same image (``template_image``), since template ids differ
+between databases. Canvas data is normalized (see
+``validators.normalize_canvas_data``) before validation, so designs saved by
+older editors import cleanly; records that still fail validation are rejected
+and reported by key.
+"""
+
+import json
+import tarfile
+import tempfile
+import uuid
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import SuspiciousOperation
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Template, UserDesign
+from .validators import CanvasValidationError, normalize_canvas_data, validate_canvas_data
+
+DESIGNS_MEMBER = 'designs.ndjson'
+MEDIA_PREFIX = 'media/'
+DEFAULT_CHUNK_SIZE = 500
+
+
+def design_to_record(design):
+    return {
+        'id': design.id,
+        'key': str(design.export_key),
+        'user': design.user.username,
+        'template_id': design.template_id,
+        'template_image': design.template.image.name if design.template else None,
+        'design_name': design.design_name,
+        'canvas_data': design.canvas_data,
+        'preview_image': design.preview_image.name or None,
+        'created_at': design.created_at.isoformat(),
+        'updated_at': design.updated_at.isoformat(),
+    }
+
+
+def iter_ndjson(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield each design in ``queryset`` as one NDJSON line (bytes)"""
+    designs = queryset.select_related('user', 'template').order_by('pk').iterator(chunk_size=chunk_size)
+    for design in designs:
+        yield (json.dumps(design_to_record(design), separators=(',', ':')) + '\n').encode()
+
+
+def referenced_media(record):
+    """Storage names of the preview image and element images a design record uses"""
+    names = []
+    if record.get('preview_image'):
+        names.append(record['preview_image'])
+    canvas_data = record.get('canvas_data')
+    elements = canvas_data.get('elements') if isinstance(canvas_data, dict) else None
+    for element in elements or []:
+        url = element.get('image') if isinstance(element, dict) else None
+        if not isinstance(url, str):
+            continue
+        # Element images may be saved as absolute URLs on this site's host
+        if not url.startswith(settings.MEDIA_URL):
+            url = urlsplit(url).path
+        if url.startswith(settings.MEDIA_URL):
+            names.append(url[len(settings.MEDIA_URL):])
+    # Names come from user-controlled URLs; never let one step outside the media root
+    return [name for name in dict.fromkeys(names) if '..' not in name.split('/') and not name.startswith('/')]
+
+
+class _StreamBuffer:
+    """Write-only file object whose contents are drained after every tar member"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_tarball(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield a .tar.gz containing designs.ndjson followed by every referenced
+    media file under media/. The NDJSON member is spooled to a temporary file
+    first because tar headers need its size up front.
+    """
+    buffer = _StreamBuffer()
+    with tempfile.TemporaryFile() as designs_file, tarfile.open(fileobj=buffer, mode='w|gz') as tar:
+        for line in iter_ndjson(queryset, chunk_size):
+            designs_file.write(line)
+        info = tarfile.TarInfo(DESIGNS_MEMBER)
+        info.size = designs_file.tell()
+        designs_file.seek(0)
+        tar.addfile(info, designs_file)
+        yield buffer.drain()
+
+        designs_file.seek(0)
+        for line in designs_file:
+            for name in referenced_media(json.loads(line)):
+                try:
+                    size = default_storage.size(name)
+                    media_file = default_storage.open(name)
+                except (OSError, ValueError, SuspiciousOperation):
+                    continue
+                with media_file:
+                    info = tarfile.TarInfo(MEDIA_PREFIX + name)
+                    info.size = size
+                    tar.addfile(info, media_file)
+                yield buffer.drain()
+    yield buffer.drain()
+
+
+class DesignImportReport:
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0  # unknown user or already imported
+        self.errors = []  # (record key or line number, message)
+
+
+def _parse_timestamp(value):
+    return parse_datetime(value) if isinstance(value, str) else None
+
+
+def _parse_key(value):
+    try:
+        return uuid.UUID(value)
+    except (TypeError, ValueError, AttributeError):
+        # Records without a usable key are imported once more on every run
+        return uuid.uuid4()
+
+
+def _resolve_templates(records):
+    """Map each record's template_image to the pk of the target template with that image"""
+    images = {record.get('template_image') for record in records if isinstance(record.get('template_image'), str)}
+    return dict(Template.objects.filter(image__in=images).order_by('-pk').values_list('image', 'pk'))
+
+
+def _record_label(record, line_number):
+    key = record.get('key')
+    return key if isinstance(key, str) and key else f'line {line_number}'
+
+
+def _flush(batch, report, owner=None):
+    """bulk_create one batch of (line number, record) pairs in its own transaction, updating ``report``"""
+    records = [record for _, record in batch]
+    usernames = {record.get('user') for record in records}
+    users = {} if owner else dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+    templates = _resolve_templates(records)
+
+    candidates = []
+    for line_number, record in batch:
+        user_id = owner.id if owner else users.get(record.get('user'))
+        if user_id is None:
+            report.skipped += 1
+            continue
+        canvas_data = normalize_canvas_data(record.get('canvas_data') or {})
+        try:
+            validate_canvas_data(canvas_data)
+        except CanvasValidationError as e:
+            report.errors.append((_record_label(record, line_number), str(e)))
+            continue
+        candidates.append((record, user_id, _parse_key(record.get('key')), canvas_data))
+
+    existing = set(UserDesign.objects.filter(
+        export_key__in={key for _, _, key, _ in candidates}
+    ).values_list('user_id', 'export_key'))
+
+    designs, timestamps = [], []
+    for record, user_id, key, canvas_data in candidates:
+        if (user_id, key) in existing:
+            report.skipped += 1
+            continue
+        existing.add((user_id, key))
+        designs.append(UserDesign(
+            user_id=user_id,
+            template_id=templates.get(record.get('template_image')),
+            design_name=str(record.get('design_name') or 'Imported design')[:200],
+            canvas_data=canvas_data,
+            preview_image=record.get('preview_image') or None,
+            export_key=key,
+        ))
+        timestamps.append((_parse_timestamp(record.get('created_at')), _parse_timestamp(record.get('updated_at'))))
+
+    with transaction.atomic():
+        created = UserDesign.objects.bulk_create(designs)
+        # auto_now_add/auto_now overwrote the exported timestamps during bulk_create
+        restored = []
+        for design, (created_at, updated_at) in zip(created, timestamps):
+            if design.pk and created_at and updated_at:
+                design.created_at, design.updated_at = created_at, updated_at
+                restored.append(design)
+        if restored:
+            UserDesign.objects.bulk_update(restored, ['created_at', 'updated_at'])
+    report.created += len(created)
+
+
+def import_ndjson(lines, batch_size=DEFAULT_CHUNK_SIZE, owner=None):
+    """
+    Create designs from an iterable of NDJSON lines, ``batch_size`` at a time.
+    Records whose user does not exist are skipped unless ``owner`` is given,
+    in which case every design is assigned to that user; designs that were
+    already imported are skipped too. Malformed lines and invalid canvas data
+    are reported in the returned DesignImportReport's ``errors``.
+    """
+    report = DesignImportReport()
+    batch = []
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            report.errors.append((f'line {line_number}', 'not a JSON object'))
+            continue
+        batch.append((line_number, record))
+        if len(batch) >= batch_size:
+            _flush(batch, report, owner)
+            batch = []
+    if batch:
+        _flush(batch, report, owner)
+    return report
+
+
+def import_tarball(fileobj, batch_size=DEFAULT_CHUNK_SIZE, owner=None):
+    """Import a tarball written by iter_tarball, restoring media files that are missing from storage"""
+    report = DesignImportReport()
+    with tarfile.open(fileobj=fileobj, mode='r|gz') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            if member.name == DESIGNS_MEMBER:
+                report = import_ndjson(tar.extractfile(member), batch_size, owner)
+            elif member.name.startswith(MEDIA_PREFIX) and '..' not in member.name:
+                name = member.name[len(MEDIA_PREFIX):]
+                if not default_storage.exists(name):
+                    default_storage.save(name, tar.extractfile(member))
+    return report
+
+
+def export_filename(suffix):
+    return f'designs-{timezone.localtime():%Y%m%d-%H%M%S}.{suffix}'
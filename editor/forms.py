@@ -1,3 +1,5 @@
+import zipfile
+
 from django import forms
 from .models import Template, UserDesign, UserUploadedImage, TemplateCategory
 
@@ -74,3 +76,17 @@ class DesignSaveForm(forms.ModelForm):
                 'placeholder': 'Enter design name'
             })
         }
+
+
+class TemplateBulkUploadForm(forms.Form):
+    archive = forms.FileField(
+        help_text='ZIP of template images; each top-level folder becomes a category',
+        widget=forms.FileInput(attrs={'accept': '.zip'})
+    )
+
+    def clean_archive(self):
+        archive = self.cleaned_data['archive']
+        if not zipfile.is_zipfile(archive):
+            raise forms.ValidationError('Please upload a ZIP archive.')
+        archive.seek(0)
+        return archive
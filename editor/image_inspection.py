@@ -0,0 +1,39 @@
+"""
+Image validation run in the bulk template import's worker processes.
+
+This module must not import Django: under the ``spawn`` and ``forkserver``
+start methods (the defaults on macOS and, from Python 3.14, on Linux) each
+worker imports it from scratch, before any settings are configured.
+"""
+
+import zipfile
+from io import BytesIO
+
+from PIL import Image, UnidentifiedImageError
+
+MAX_IMAGE_PIXELS = 50000000
+
+
+def open_source(archive, member):
+    """Binary file object for a file on disk (archive is None) or a member of a ZIP archive"""
+    if archive is None:
+        return open(member, 'rb')
+    with zipfile.ZipFile(archive) as zf:
+        return BytesIO(zf.read(member))
+
+
+def inspect_image(source):
+    """Validate one (archive, member, category) image, returning (width, height, None) or (None, None, error)"""
+    archive, member, category = source
+    try:
+        with open_source(archive, member) as fileobj:
+            with Image.open(fileobj) as image:
+                width, height = image.size
+                if width * height > MAX_IMAGE_PIXELS:
+                    return None, None, f'Image is too large ({width}x{height})'
+                image.verify()
+    except UnidentifiedImageError:
+        return None, None, 'Not a recognised image format'
+    except Exception as e:  # Pillow raises many unrelated types for corrupt files
+        return None, None, f'Invalid image: {e}'
+    return width, height, None
@@ -0,0 +1,53 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from editor.validators import max_elements, validate_canvas_data
+
+
+def build_canvas(element_count):
+    elements = []
+    for i in range(element_count):
+        if i % 2:
+            elements.append({
+                'type': 'image',
+                'image': f'/media/user_images/image_{i}.jpg',
+                'x': i, 'y': i,
+                'width': 320.5, 'height': 240.25,
+                'originalAspectRatio': 1.334,
+                'rotation': 0,
+            })
+        else:
+            elements.append({
+                'type': 'text',
+                'text': f'Sample text {i} ' * 4,
+                'x': i, 'y': i,
+                'fontFamily': 'Times New Roman',
+                'fontSize': 24,
+                'color': '#1A2B3C',
+                'rotation': 0,
+            })
+    return {'elements': elements}
+
+
+class Command(BaseCommand):
+    help = 'Measure canvas_data validation cost per KB of JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--elements', type=int, nargs='+', default=[10, 100, max_elements()])
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(f'{"elements":>10} {"size KB":>10} {"us/doc":>10} {"us/KB":>10}')
+        for element_count in options['elements']:
+            canvas = build_canvas(element_count)
+            size_kb = len(json.dumps(canvas).encode()) / 1024
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                validate_canvas_data(canvas)
+            per_doc = (time.perf_counter() - start) / repeat * 1e6
+
+            self.stdout.write(f'{element_count:>10} {size_kb:>10.1f} {per_doc:>10.1f} {per_doc / size_kb:>10.2f}')
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+from editor.collab import CollaborationConsumer
+from editor.models import UserDesign
+
+
+class FakeClient:
+    """In-process WebSocket client driving the ASGI consumer directly"""
+
+    def __init__(self, index, cookie, design_id, expected):
+        self.index = index
+        self.scope = {
+            'type': 'websocket',
+            'path': f'/ws/designs/{design_id}/',
+            'headers': [(b'cookie', cookie.encode())],
+        }
+        self.incoming = asyncio.Queue()
+        self.expected = expected
+        self.received = 0
+        self.latencies = []
+        self.ready = asyncio.Event()
+        self.done = asyncio.Event()
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send(self, message):
+        if message['type'] != 'websocket.send':
+            return
+        data = json.loads(message['text'])
+        if data['type'] == 'snapshot':
+            self.ready.set()
+        elif data['type'] == 'op':
+            self.latencies.append(time.perf_counter() - float(data['client_op_id'].rsplit(':', 1)[1]))
+            self.received += 1
+            if self.received >= self.expected:
+                self.done.set()
+
+    def send_op(self, seq, op):
+        self.incoming.put_nowait({
+            'type': 'websocket.receive',
+            'text': json.dumps({'type': 'op', 'client_op_id': f'{self.index}:{seq}:{time.perf_counter()}', 'op': op}),
+        })
+
+
+class Command(BaseCommand):
+    help = 'Measure op fan-out latency for N collaborative editing clients in one room'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Owner of the scratch design used for the test')
+        parser.add_argument('--clients', type=int, default=20)
+        parser.add_argument('--ops', type=int, default=50, help='Ops sent by each client')
+        parser.add_argument('--interval', type=float, default=0.01, help='Seconds between ops per client')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["username"]}" does not exist')
+
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        design = UserDesign.objects.create(user=user, design_name='collab load test', canvas_data={'elements': []})
+        try:
+            results = asyncio.run(self.run(
+                f'{settings.SESSION_COOKIE_NAME}={session.session_key}',
+                design.pk, options['clients'], options['ops'], options['interval'],
+            ))
+        finally:
+            design.delete()
+            session.delete()
+
+        latencies, elapsed = results
+        latencies_ms = sorted(latency * 1000 for latency in latencies)
+        quantiles = statistics.quantiles(latencies_ms, n=100)
+        self.stdout.write(
+            f'{options["clients"]} clients x {options["ops"]} ops: {len(latencies_ms)} deliveries '
+            f'in {elapsed:.2f}s ({len(latencies_ms) / elapsed:.0f} msg/s)'
+        )
+        self.stdout.write(
+            f'fan-out latency ms  p50={quantiles[49]:.2f}  p95={quantiles[94]:.2f}  '
+            f'p99={quantiles[98]:.2f}  max={latencies_ms[-1]:.2f}'
+        )
+
+    async def run(self, cookie, design_id, client_count, op_count, interval):
+        consumer = CollaborationConsumer()
+        # Every client receives every op, including the add that creates each client's element
+        expected = client_count * (op_count + 1)
+        clients = [FakeClient(index, cookie, design_id, expected) for index in range(client_count)]
+
+        tasks = []
+        for client in clients:
+            client.incoming.put_nowait({'type': 'websocket.connect'})
+            tasks.append(asyncio.create_task(consumer(client.scope, client.receive, client.send)))
+        await asyncio.wait_for(asyncio.gather(*(client.ready.wait() for client in clients)), timeout=30)
+
+        async def drive(client):
+            element_id = f'load-{client.index}'
+            client.send_op(0, {'action': 'add', 'element': {
+                'id': element_id, 'type': 'text', 'text': f'Client {client.index}',
+                'x': 0, 'y': 0, 'fontFamily': 'Arial', 'fontSize': 24, 'color': '#000000',
+            }})
+            for seq in range(1, op_count + 1):
+                await asyncio.sleep(interval)
+                client.send_op(seq, {'action': 'update', 'id': element_id, 'changes': {'x': seq, 'y': seq}})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(drive(client) for client in clients))
+        await asyncio.wait_for(asyncio.gather(*(client.done.wait() for client in clients)), timeout=60)
+        elapsed = time.perf_counter() - start
+
+        for client in clients:
+            client.incoming.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.gather(*tasks)
+        return [latency for client in clients for latency in client.latencies], elapsed
@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from editor.exports import DEFAULT_CHUNK_SIZE, iter_ndjson, iter_tarball
+from editor.models import UserDesign
+
+
+class Command(BaseCommand):
+    help = 'Export user designs as NDJSON, or as a .tar.gz bundling their media with --media'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', default=[],
+                            help='Username to export (repeatable); defaults to all users')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+        parser.add_argument('--media', action='store_true', help='Write a .tar.gz including referenced media files')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        designs = UserDesign.objects.all()
+        if options['users']:
+            designs = designs.filter(user__username__in=options['users'])
+
+        if options['media'] and not options['output']:
+            raise CommandError('--media requires --output')
+
+        chunks = (iter_tarball if options['media'] else iter_ndjson)(designs, options['chunk_size'])
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f'Exported designs to {options["output"]}'))
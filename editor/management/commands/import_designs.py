@@ -0,0 +1,44 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from editor.exports import DEFAULT_CHUNK_SIZE, import_ndjson, import_tarball
+
+
+class Command(BaseCommand):
+    help = 'Import designs from an NDJSON file or a .tar.gz written by export_designs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--owner', help='Assign every imported design to this username')
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['owner']:
+            try:
+                owner = User.objects.get(username=options['owner'])
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["owner"]}" does not exist')
+
+        start = time.perf_counter()
+        path = options['path']
+        if path.endswith(('.tar.gz', '.tgz')):
+            with open(path, 'rb') as fileobj:
+                report = import_tarball(fileobj, options['batch_size'], owner)
+        else:
+            with open(path, encoding='utf-8') as lines:
+                report = import_ndjson(lines, options['batch_size'], owner)
+
+        # bulk_create bypasses the signals that maintain template usage counters
+        call_command('reconcile_template_usage', stdout=self.stdout)
+
+        elapsed = time.perf_counter() - start
+        for label, message in report.errors:
+            self.stderr.write(self.style.WARNING(f'{label}: {message}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.created} design(s), skipped {report.skipped} (unknown user or already imported), '
+            f'{len(report.errors)} error(s), in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,36 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from editor.template_import import import_templates
+
+
+class Command(BaseCommand):
+    help = 'Bulk import template images from a directory or ZIP; subfolders become categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--uploaded-by', help='Username recorded as the uploader')
+        parser.add_argument('--workers', type=int, default=None, help='Image validation processes (default: CPU count)')
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f'{options["path"]} does not exist')
+
+        uploaded_by = None
+        if options['uploaded_by']:
+            try:
+                uploaded_by = User.objects.get(username=options['uploaded_by'])
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["uploaded_by"]}" does not exist')
+
+        report = import_templates(options['path'], uploaded_by, options['workers'], options['batch_size'])
+
+        for path, message in report.errors:
+            self.stderr.write(self.style.WARNING(f'{path}: {message}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.created} template(s), {len(report.errors)} error(s) '
+            f'in {report.elapsed:.1f}s ({report.throughput:.1f} files/s)'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from editor.models import RECENT_USE_WINDOW, Template, UserDesign
+
+
+class Command(BaseCommand):
+    help = 'Recompute Template.use_count and recent_use_count from UserDesign rows (run periodically, e.g. hourly)'
+
+    def handle(self, *args, **options):
+        since = timezone.now() - RECENT_USE_WINDOW
+        designs = UserDesign.objects.filter(template=OuterRef('pk')).order_by().values('template')
+        total = designs.annotate(n=Count('pk')).values('n')
+        recent = designs.annotate(n=Count('pk', filter=Q(created_at__gte=since))).values('n')
+
+        stale = list(Template.objects.annotate(
+            actual_use=Coalesce(Subquery(total), Value(0)),
+            actual_recent=Coalesce(Subquery(recent), Value(0)),
+        ).exclude(
+            use_count=F('actual_use'), recent_use_count=F('actual_recent')
+        ).values_list('pk', 'actual_use', 'actual_recent'))
+
+        for pk, use_count, recent_use_count in stale:
+            Template.objects.filter(pk=pk).update(use_count=use_count, recent_use_count=recent_use_count)
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled usage counters for {len(stale)} template(s)'))
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+
+from .routers import get_replicas, pinned_to_primary, wrote_to_primary
+
+PIN_COOKIE_NAME = 'db_primary_until'
+
+
+class ReadYourWritesMiddleware:
+    """Keep a client's reads on the primary database for a short while after it writes"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_replicas():
+            return self.get_response(request)
+
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE_NAME, 0))
+        except ValueError:
+            pinned_until = 0
+
+        pinned_token = pinned_to_primary.set(pinned_until > time.time())
+        wrote_token = wrote_to_primary.set(False)
+        try:
+            response = self.get_response(request)
+            if wrote_to_primary.get():
+                window = getattr(settings, 'READ_YOUR_WRITES_SECONDS', 10)
+                response.set_cookie(
+                    PIN_COOKIE_NAME, str(time.time() + window),
+                    max_age=window, httponly=True, samesite='Lax',
+                )
+        finally:
+            pinned_to_primary.reset(pinned_token)
+            wrote_to_primary.reset(wrote_token)
+        return response
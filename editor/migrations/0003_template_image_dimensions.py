@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-19 09:15
+
+from django.db import migrations, models
+
+
+def backfill_dimensions(apps, schema_editor):
+    Template = apps.get_model('editor', 'Template')
+    for template in Template.objects.filter(image_width__isnull=True).iterator():
+        try:
+            template.image_width, template.image_height = template.image.width, template.image.height
+        except (OSError, ValueError):
+            continue
+        template.save(update_fields=['image_width', 'image_height'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0002_alter_userdesign_template_templatecategory_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='template',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_dimensions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:02
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def backfill_usage_counts(apps, schema_editor):
+    Template = apps.get_model('editor', 'Template')
+    UserDesign = apps.get_model('editor', 'UserDesign')
+    since = timezone.now() - datetime.timedelta(days=7)
+    designs = UserDesign.objects.filter(template=OuterRef('pk')).order_by().values('template')
+    Template.objects.update(
+        use_count=Coalesce(Subquery(designs.annotate(n=Count('pk')).values('n')), Value(0)),
+        recent_use_count=Coalesce(
+            Subquery(designs.annotate(n=Count('pk', filter=Q(created_at__gte=since))).values('n')), Value(0)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0003_template_image_dimensions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='recent_use_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='template',
+            name='use_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='template',
+            index=models.Index(fields=['-use_count', '-created_at'], name='template_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='template',
+            index=models.Index(fields=['-recent_use_count', '-created_at'], name='template_trending_idx'),
+        ),
+        migrations.RunPython(backfill_usage_counts, migrations.RunPython.noop),
+    ]
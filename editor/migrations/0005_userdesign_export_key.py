@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0004_template_usage_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdesign',
+            name='export_key',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:40
+
+import uuid
+
+from django.db import migrations
+
+
+def backfill_export_keys(apps, schema_editor):
+    UserDesign = apps.get_model('editor', 'UserDesign')
+    designs = []
+    for design in UserDesign.objects.filter(export_key__isnull=True).only('pk').iterator():
+        design.export_key = uuid.uuid4()
+        designs.append(design)
+        if len(designs) >= 500:
+            UserDesign.objects.bulk_update(designs, ['export_key'])
+            designs = []
+    UserDesign.objects.bulk_update(designs, ['export_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0005_userdesign_export_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_export_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:40
+
+import uuid
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0006_backfill_userdesign_export_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userdesign',
+            name='export_key',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='userdesign',
+            constraint=models.UniqueConstraint(fields=('user', 'export_key'), name='userdesign_user_export_key_unique'),
+        ),
+    ]
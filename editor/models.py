@@ -1,6 +1,13 @@
+import uuid
+from datetime import timedelta
+
+from django.core.files.images import get_image_dimensions
 from django.db import models
 from django.contrib.auth.models import User
 
+# Designs created within this window count towards Template.recent_use_count
+RECENT_USE_WINDOW = timedelta(days=7)
+
 class TemplateCategory(models.Model):
     name = models.CharField(max_length=100, unique=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
@@ -17,17 +24,33 @@ class TemplateCategory(models.Model):
 class Template(models.Model):
     name = models.CharField(max_length=200)
     image = models.ImageField(upload_to='templates/')
+    # Filled explicitly when the image is uploaded (see read_image_dimensions), never
+    # through width_field/height_field, which would open the file on every model load
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     category = models.ForeignKey(TemplateCategory, on_delete=models.SET_NULL, null=True, blank=True, related_name='templates')
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     is_admin_template = models.BooleanField(default=False)
+    # Denormalized usage counters, kept current by editor.signals and
+    # corrected by the reconcile_template_usage command
+    use_count = models.PositiveIntegerField(default=0, editable=False)
+    recent_use_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+    def read_image_dimensions(self):
+        """Set image_width/image_height from a newly assigned image file with Pillow"""
+        self.image_width, self.image_height = get_image_dimensions(self.image)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-use_count', '-created_at'], name='template_popular_idx'),
+            models.Index(fields=['-recent_use_count', '-created_at'], name='template_trending_idx'),
+        ]
 
 
 class UserDesign(models.Model):
@@ -36,6 +59,8 @@ class UserDesign(models.Model):
     design_name = models.CharField(max_length=200)
     canvas_data = models.JSONField()
     preview_image = models.ImageField(upload_to='saved_designs/', blank=True, null=True)
+    # Survives export/import round trips, so re-importing a design never duplicates it
+    export_key = models.UUIDField(default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -44,6 +69,9 @@ class UserDesign(models.Model):
 
     class Meta:
         ordering = ['-updated_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'export_key'], name='userdesign_user_export_key_unique'),
+        ]
 
 
 class UserUploadedImage(models.Model):
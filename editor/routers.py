@@ -0,0 +1,48 @@
+"""
+Database router that sends reads to read replicas and writes to ``default``.
+
+Replicas are the aliases listed in ``settings.DATABASE_REPLICAS``. Once a
+request writes, every later query in that request (and, through
+``ReadYourWritesMiddleware``, the same client's requests for
+``READ_YOUR_WRITES_SECONDS``) is pinned to the primary so users always see
+what they just saved despite replication lag.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY_DB = 'default'
+
+# Per request/task flags, safe under both WSGI threads and ASGI tasks
+pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+wrote_to_primary = ContextVar('wrote_to_primary', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or pinned_to_primary.get():
+            return PRIMARY_DB
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        wrote_to_primary.set(True)
+        pinned_to_primary.set(True)
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from any of them may be related
+        pool = {PRIMARY_DB, *get_replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication, never directly
+        return db == PRIMARY_DB
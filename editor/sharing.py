@@ -0,0 +1,82 @@
+"""
+Signed public share links for saved designs.
+
+A share token is a signed ``(design id, expiry)`` pair, so links need no
+database rows and cannot be forged or extended. The shared image is rendered
+once per design version from the saved preview and stored under a name that
+includes ``updated_at``; every later hit is a plain media-file response.
+Rendering a new version deletes the design's older share images.
+"""
+
+import posixpath
+import time
+from io import BytesIO
+
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+SHARE_SALT = 'editor.share'
+SHARE_IMAGE_DIR = 'shared_designs'
+SHARE_IMAGE_MAX_SIZE = (1200, 1200)
+
+
+def make_share_token(design, expires_in=None):
+    """Token for ``design``, valid forever or for ``expires_in`` seconds"""
+    expires_at = int(time.time() + expires_in) if expires_in else None
+    return signing.dumps([design.pk, expires_at], salt=SHARE_SALT, compress=True)
+
+
+def read_share_token(token):
+    """Return (design id, expires_at or None), raising signing.BadSignature if invalid or expired"""
+    try:
+        design_id, expires_at = signing.loads(token, salt=SHARE_SALT)
+    except (TypeError, ValueError):
+        raise signing.BadSignature('Malformed share token')
+    if expires_at is not None and expires_at < time.time():
+        raise signing.SignatureExpired('Share link has expired')
+    return design_id, expires_at
+
+
+def share_image_name(design):
+    return f'{SHARE_IMAGE_DIR}/{design.pk}-{int(design.updated_at.timestamp())}.jpg'
+
+
+def delete_older_share_images(design):
+    """Remove share images rendered for earlier versions of ``design``"""
+    prefix = f'{design.pk}-'
+    version = int(design.updated_at.timestamp())
+    directories, files = default_storage.listdir(SHARE_IMAGE_DIR)
+    for filename in files:
+        if not filename.startswith(prefix) or not filename.endswith('.jpg'):
+            continue
+        # Storage may have suffixed a name, e.g. 12-1700000000_AbCdEf1.jpg
+        rendered_at = filename[len(prefix):-len('.jpg')].split('_')[0]
+        # Never touch a newer version another request rendered meanwhile
+        if rendered_at.isdigit() and int(rendered_at) < version:
+            default_storage.delete(posixpath.join(SHARE_IMAGE_DIR, filename))
+
+
+def ensure_share_image(design):
+    """Storage name of the rendered share image, rendering it on the first request for this version"""
+    name = share_image_name(design)
+    if default_storage.exists(name):
+        return name
+
+    source = design.preview_image or (design.template.image if design.template else None)
+    if not source:
+        return None
+
+    with source.open('rb') as fileobj, Image.open(fileobj) as image:
+        image = image.convert('RGB')
+        image.thumbnail(SHARE_IMAGE_MAX_SIZE)
+        output = BytesIO()
+        image.save(output, 'JPEG', quality=85, optimize=True)
+
+    saved_name = default_storage.save(name, ContentFile(output.getvalue()))
+    if saved_name != name:
+        # A concurrent request rendered this version first; drop the suffixed duplicate
+        default_storage.delete(saved_name)
+    delete_older_share_images(design)
+    return name
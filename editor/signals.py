@@ -0,0 +1,28 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import RECENT_USE_WINDOW, Template, UserDesign
+
+
+@receiver(post_save, sender=UserDesign)
+def count_template_use(sender, instance, created, raw=False, **kwargs):
+    """Atomically bump the template's usage counters when a design is created"""
+    if created and not raw and instance.template_id:
+        Template.objects.filter(pk=instance.template_id).update(
+            use_count=F('use_count') + 1,
+            recent_use_count=F('recent_use_count') + 1,
+        )
+
+
+@receiver(post_delete, sender=UserDesign)
+def uncount_template_use(sender, instance, **kwargs):
+    """Atomically drop the template's usage counters when a design is deleted"""
+    if not instance.template_id:
+        return
+    updates = {'use_count': Greatest(F('use_count') - 1, 0)}
+    if instance.created_at and instance.created_at >= timezone.now() - RECENT_USE_WINDOW:
+        updates['recent_use_count'] = Greatest(F('recent_use_count') - 1, 0)
+    Template.objects.filter(pk=instance.template_id).update(**updates)
@@ -1,5 +1,5 @@
 class CanvasEditor {
-    constructor(canvasId, templateImageUrl) {
+    constructor(canvasId, templateImageUrl, templateWidth, templateHeight) {
         this.canvas = document.getElementById(canvasId);
         this.ctx = this.canvas.getContext('2d');
         this.elements = [];
@@ -13,10 +13,17 @@ class CanvasEditor {
         this.editModal = null;
         this.lastTap = 0;
         this.tapTimeout = null;
+        this.onChange = null; // called with element-level ops for collaborative editing
         
         // Detect device type
         this.isMobile = /Android|webOS|iPhone|iPad|iPod|BlackBerry|IEMobile|Opera Mini/i.test(navigator.userAgent);
         this.handleSize = this.isMobile ? 20 : 10; // Larger handles for mobile
+
+        // Size the canvas up front when the server already knows the template dimensions
+        if (templateWidth && templateHeight) {
+            this.canvas.width = templateWidth;
+            this.canvas.height = templateHeight;
+        }
         
         this.loadTemplateImage(templateImageUrl);
         this.setupEventListeners();
@@ -222,6 +229,16 @@ class CanvasEditor {
     }
 
     handleMouseUp() {
+        if ((this.isDragging || this.isResizing) && this.selectedElement) {
+            const elem = this.selectedElement;
+            const changes = { x: elem.x, y: elem.y };
+            if (elem.type === 'text') {
+                changes.fontSize = elem.fontSize;
+            } else {
+                Object.assign(changes, { width: elem.width, height: elem.height, originalAspectRatio: elem.originalAspectRatio });
+            }
+            this.notifyChange({ action: 'update', id: elem.id, changes: changes });
+        }
         this.isDragging = false;
         this.isResizing = false;
         this.resizeHandle = null;
@@ -382,6 +399,12 @@ class CanvasEditor {
             this.selectedElement.fontFamily = document.getElementById('editFontFamily').value;
             this.selectedElement.fontSize = parseInt(document.getElementById('editFontSize').value);
 
+            const elem = this.selectedElement;
+            this.notifyChange({
+                action: 'update',
+                id: elem.id,
+                changes: { text: elem.text, color: elem.color, fontFamily: elem.fontFamily, fontSize: elem.fontSize }
+            });
             this.render();
             this.editModal.hide();
         }
@@ -405,6 +428,7 @@ class CanvasEditor {
 
     addText(text, fontFamily, fontSize, color) {
         const element = {
+            id: this.newElementId(),
             type: 'text',
             text: text,
             x: 50,
@@ -416,6 +440,7 @@ class CanvasEditor {
         };
         this.elements.push(element);
         this.selectedElement = element;
+        this.notifyChange({ action: 'add', element: this.serializeElement(element) });
         this.render();
     }
 
@@ -438,6 +463,7 @@ class CanvasEditor {
             }
 
             const element = {
+                id: this.newElementId(),
                 type: 'image',
                 image: img,
                 x: 50,
@@ -449,6 +475,7 @@ class CanvasEditor {
             };
             this.elements.push(element);
             this.selectedElement = element;
+            this.notifyChange({ action: 'add', element: this.serializeElement(element) });
             this.render();
             if (callback) callback();
         };
@@ -460,6 +487,7 @@ class CanvasEditor {
             const index = this.elements.indexOf(this.selectedElement);
             if (index > -1) {
                 this.elements.splice(index, 1);
+                this.notifyChange({ action: 'remove', id: this.selectedElement.id });
                 this.selectedElement = null;
                 this.render();
             }
@@ -472,6 +500,7 @@ class CanvasEditor {
             if (index > -1) {
                 this.elements.splice(index, 1);
                 this.elements.push(this.selectedElement);
+                this.notifyChange({ action: 'reorder', id: this.selectedElement.id, index: this.elements.length - 1 });
                 this.render();
             }
         }
@@ -483,6 +512,7 @@ class CanvasEditor {
             if (index > -1) {
                 this.elements.splice(index, 1);
                 this.elements.unshift(this.selectedElement);
+                this.notifyChange({ action: 'reorder', id: this.selectedElement.id, index: 0 });
                 this.render();
             }
         }
@@ -505,7 +535,7 @@ class CanvasEditor {
                 this.ctx.font = `${elem.fontSize}px ${elem.fontFamily}`;
                 this.ctx.fillStyle = elem.color;
                 this.ctx.fillText(elem.text, elem.x, elem.y);
-            } else if (elem.type === 'image' && elem.image) {
+            } else if (elem.type === 'image' && elem.image && elem.image.complete && elem.image.naturalWidth) {
                 this.ctx.drawImage(elem.image, elem.x, elem.y, elem.width, elem.height);
             }
 
@@ -572,60 +602,96 @@ class CanvasEditor {
         this.ctx.stroke();
     }
 
+    newElementId() {
+        return Math.random().toString(36).slice(2, 14);
+    }
+
+    notifyChange(op) {
+        if (this.onChange) {
+            this.onChange(op);
+        }
+    }
+
+    serializeElement(elem) {
+        if (elem.type === 'image') {
+            return {
+                id: elem.id,
+                type: elem.type,
+                x: elem.x,
+                y: elem.y,
+                width: elem.width,
+                height: elem.height,
+                rotation: elem.rotation,
+                originalAspectRatio: elem.originalAspectRatio,
+                image: elem.image.src
+            };
+        }
+        return elem;
+    }
+
     getCanvasData() {
         return {
-            elements: this.elements.map(elem => {
-                if (elem.type === 'image') {
-                    return {
-                        type: elem.type,
-                        x: elem.x,
-                        y: elem.y,
-                        width: elem.width,
-                        height: elem.height,
-                        rotation: elem.rotation,
-                        originalAspectRatio: elem.originalAspectRatio,
-                        image: elem.image.src
-                    };
-                }
-                return elem;
-            })
+            elements: this.elements.map(elem => this.serializeElement(elem))
+        };
+    }
+
+    createElement(data) {
+        if (data.type !== 'image') {
+            return Object.assign({}, data);
+        }
+        // Keep the element in place while its image loads so stacking order is preserved
+        const img = new Image();
+        img.crossOrigin = "anonymous";
+        img.onload = () => this.render();
+        img.src = data.image;
+        return {
+            id: data.id || this.newElementId(),
+            type: 'image',
+            image: img,
+            x: data.x,
+            y: data.y,
+            width: data.width,
+            height: data.height,
+            originalAspectRatio: data.originalAspectRatio || (data.width / data.height),
+            rotation: data.rotation || 0
         };
     }
 
     loadCanvasData(data) {
         this.elements = [];
+        this.selectedElement = null;
         if (data && data.elements) {
-            const promises = [];
-            
-            data.elements.forEach(elem => {
-                if (elem.type === 'image') {
-                    const promise = new Promise((resolve) => {
-                        const img = new Image();
-                        img.crossOrigin = "anonymous";
-                        img.onload = () => {
-                            this.elements.push({
-                                type: 'image',
-                                image: img,
-                                x: elem.x,
-                                y: elem.y,
-                                width: elem.width,
-                                height: elem.height,
-                                originalAspectRatio: elem.originalAspectRatio || (elem.width / elem.height),
-                                rotation: elem.rotation || 0
-                            });
-                            resolve();
-                        };
-                        img.src = elem.image;
-                    });
-                    promises.push(promise);
-                } else {
-                    this.elements.push(elem);
+            this.elements = data.elements.map(elem => {
+                const element = this.createElement(elem);
+                if (!element.id) {
+                    element.id = this.newElementId();
                 }
+                return element;
             });
+        }
+        this.render();
+    }
 
-            Promise.all(promises).then(() => {
-                this.render();
-            });
+    // Apply an op made by another collaborator without echoing it back
+    applyRemoteOp(op) {
+        const index = this.elements.findIndex(elem => elem.id === (op.action === 'add' ? op.element.id : op.id));
+
+        if (op.action === 'add' && index === -1) {
+            const element = this.createElement(op.element);
+            const at = op.index === null || op.index === undefined ? this.elements.length : op.index;
+            this.elements.splice(Math.max(0, at), 0, element);
+        } else if (index === -1) {
+            return;
+        } else if (op.action === 'update') {
+            Object.assign(this.elements[index], op.changes);
+        } else if (op.action === 'remove') {
+            if (this.selectedElement === this.elements[index]) {
+                this.selectedElement = null;
+            }
+            this.elements.splice(index, 1);
+        } else if (op.action === 'reorder') {
+            const [element] = this.elements.splice(index, 1);
+            this.elements.splice(Math.max(0, op.index), 0, element);
         }
         this.render();
     }
@@ -657,10 +723,148 @@ class CanvasEditor {
     }
 }
 
+// Upload an image straight to object storage when enabled, otherwise through Django
+function uploadUserImage(file) {
+    if (!directUploadsEnabled) {
+        const formData = new FormData();
+        formData.append('image', file);
+
+        return fetch(uploadUserImageUrl, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': csrfToken
+            },
+            body: formData
+        })
+        .then(response => response.json());
+    }
+
+    const postJson = (url, payload) => fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrfToken
+        },
+        body: JSON.stringify(payload)
+    }).then(response => response.json());
+
+    return postJson(presignUploadUrl, {
+        kind: 'user_image',
+        filename: file.name,
+        content_type: file.type
+    })
+    .then(presigned => {
+        if (!presigned.success) {
+            return presigned;
+        }
+
+        const formData = new FormData();
+        Object.entries(presigned.fields).forEach(([name, value]) => formData.append(name, value));
+        formData.append('file', file);  // must be the last field
+
+        return fetch(presigned.url, { method: 'POST', body: formData })
+            .then(response => {
+                if (!response.ok) {
+                    return { success: false, error: 'Storage rejected the upload' };
+                }
+                return postJson(completeUploadUrl, { kind: 'user_image', key: presigned.key });
+            });
+    });
+}
+
+// Exchange element-level ops with other editors of the same design over a WebSocket
+function startCollaboration(editor, designId) {
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const url = `${protocol}//${window.location.host}/ws/designs/${designId}/`;
+    let socket = null;
+    let connectionId = null;
+    let opCounter = 0;
+    let retryDelay = 1000;
+    let connected = false;
+    let synced = false;
+    let failures = 0;
+    // Local ops the server has not echoed back yet, oldest first. They survive
+    // disconnects and are replayed on top of the next snapshot.
+    let unconfirmed = [];
+
+    const send = (entry) => {
+        entry.clientOpId = `${connectionId}-${++opCounter}`;
+        entry.sentOn = connectionId;
+        socket.send(JSON.stringify({ type: 'op', client_op_id: entry.clientOpId, op: entry.op }));
+    };
+
+    // Whether an op still has an effect on the current document
+    const stillApplies = (op) => {
+        const exists = editor.elements.some(elem => elem.id === (op.action === 'add' ? op.element.id : op.id));
+        return op.action === 'add' ? !exists : exists;
+    };
+
+    editor.onChange = (op) => {
+        const entry = { op: op, clientOpId: null, sentOn: null };
+        unconfirmed.push(entry);
+        if (synced) {
+            send(entry);
+        }
+    };
+
+    const connect = () => {
+        socket = new WebSocket(url);
+
+        socket.addEventListener('message', (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'snapshot') {
+                connected = synced = true;
+                connectionId = message.connection_id;
+                retryDelay = 1000;
+                editor.loadCanvasData({ elements: message.elements });
+                // Ops in flight on this connection are applied after the snapshot and still
+                // get echoed; the rest were made offline or lost with an old connection
+                unconfirmed = unconfirmed.filter(entry => {
+                    const inFlight = entry.sentOn === connectionId;
+                    if (!inFlight && !stillApplies(entry.op)) {
+                        return false;
+                    }
+                    editor.applyRemoteOp(entry.op);
+                    if (!inFlight) {
+                        send(entry);
+                    }
+                    return true;
+                });
+            } else if (message.type === 'op' && message.sender === connectionId) {
+                unconfirmed = unconfirmed.filter(entry => entry.clientOpId !== message.client_op_id);
+            } else if (message.type === 'op') {
+                editor.applyRemoteOp(message.op);
+                // The server applies our pending ops after this one, so do the same locally
+                unconfirmed.forEach(entry => editor.applyRemoteOp(entry.op));
+            } else if (message.type === 'error') {
+                console.warn('Collaboration op rejected:', message.error);
+                // Roll back: drop the rejected op and reload the server's document
+                unconfirmed = unconfirmed.filter(entry => entry.clientOpId !== message.client_op_id);
+                socket.send(JSON.stringify({ type: 'sync' }));
+            }
+        });
+
+        socket.addEventListener('close', (event) => {
+            synced = false;
+            // Not allowed to collaborate on this design, or the server has no WebSocket
+            // support (e.g. WSGI runserver): keep editing locally
+            if (event.code === 4403 || event.code === 4404 || (!connected && ++failures >= 3)) {
+                editor.onChange = null;
+                return;
+            }
+            setTimeout(connect, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 30000);
+        });
+    };
+
+    connect();
+}
+
 // Initialize editor
 let editor;
 window.addEventListener('DOMContentLoaded', () => {
-    editor = new CanvasEditor('canvas', templateImageUrl);
+    const bootstrapTemplate = editorBootstrap.template;
+    editor = new CanvasEditor('canvas', templateImageUrl, bootstrapTemplate.width, bootstrapTemplate.height);
 
     // Add Text Button
     document.getElementById('addTextBtn').addEventListener('click', () => {
@@ -683,17 +887,7 @@ window.addEventListener('DOMContentLoaded', () => {
         const file = fileInput.files[0];
 
         if (file) {
-            const formData = new FormData();
-            formData.append('image', file);
-
-            fetch(uploadUserImageUrl, {
-                method: 'POST',
-                headers: {
-                    'X-CSRFToken': csrfToken
-                },
-                body: formData
-            })
-            .then(response => response.json())
+            uploadUserImage(file)
             .then(data => {
                 if (data.success) {
                     editor.addImage(data.image_url);
@@ -789,18 +983,14 @@ window.addEventListener('DOMContentLoaded', () => {
         editor.downloadImage(designName + '.png');
     });
 
-    // Load existing design if design_id is in URL
-    const urlParams = new URLSearchParams(window.location.search);
-    const designId = urlParams.get('design_id');
-    if (designId) {
-        fetch(`/load-design/${designId}/`)
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    editor.loadCanvasData(data.canvas_data);
-                    document.getElementById('designName').value = data.design_name;
-                    editor.currentDesignId = designId;
-                }
-            });
+    // Load existing design embedded in the page by editor_view
+    if (editorBootstrap.design) {
+        editor.loadCanvasData(editorBootstrap.design.canvas_data);
+        document.getElementById('designName').value = editorBootstrap.design.design_name;
+        editor.currentDesignId = editorBootstrap.design.id;
+
+        if (window.WebSocket) {
+            startCollaboration(editor, editorBootstrap.design.id);
+        }
     }
 });
@@ -0,0 +1,91 @@
+"""
+Direct-to-storage uploads for S3-compatible media backends.
+
+When ``STORAGES['default']`` is django-storages' ``S3Storage`` (AWS, MinIO or
+any S3-compatible endpoint), the browser uploads images straight to the
+bucket with a presigned POST and Django only records the resulting key after
+a HEAD request confirms the object exists, so app nodes never handle those
+image bytes. The editor uses this for user images; ``complete_upload`` also
+accepts templates from API clients. The ``template_upload`` form and the
+``save_design`` preview image still stream through the app. With the local
+filesystem storage these helpers report direct uploads as disabled and the
+editor falls back to ``upload_user_image``.
+"""
+
+import posixpath
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+# kind -> key prefix; matches the upload_to of the model that records the key
+DIRECT_UPLOAD_PREFIXES = {
+    'user_image': 'user_images/',
+    'template': 'templates/',
+}
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+
+class DirectUploadError(Exception):
+    """Raised when a direct upload request or its result is not acceptable"""
+
+
+def direct_uploads_enabled():
+    return hasattr(default_storage, 'bucket_name')
+
+
+def _client():
+    return default_storage.connection.meta.client
+
+
+def _object_key(name):
+    return posixpath.join(default_storage.location, name) if default_storage.location else name
+
+
+def build_upload_name(kind, user, filename):
+    """Storage name for a new upload, namespaced by kind and user"""
+    if not isinstance(kind, str) or kind not in DIRECT_UPLOAD_PREFIXES:
+        raise DirectUploadError('Unknown upload kind')
+    if not isinstance(filename, str):
+        raise DirectUploadError('filename must be a string')
+    ext = posixpath.splitext(filename)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise DirectUploadError('Unsupported file type')
+    return f'{DIRECT_UPLOAD_PREFIXES[kind]}{user.pk}/{uuid.uuid4().hex}{ext}'
+
+
+def upload_belongs_to(name, kind, user):
+    return name.startswith(f'{DIRECT_UPLOAD_PREFIXES[kind]}{user.pk}/') and '..' not in name
+
+
+def presign_post(name, content_type):
+    """Presigned POST (url + form fields) the browser can upload ``name`` with"""
+    if not content_type.startswith('image/'):
+        raise DirectUploadError('Only image uploads are allowed')
+    return _client().generate_presigned_post(
+        Bucket=default_storage.bucket_name,
+        Key=_object_key(name),
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, settings.DIRECT_UPLOAD_MAX_BYTES],
+        ],
+        ExpiresIn=settings.DIRECT_UPLOAD_EXPIRES_SECONDS,
+    )
+
+
+def verify_upload(name):
+    """HEAD the uploaded object and check it is an image within the size limit"""
+    from botocore.exceptions import ClientError
+
+    try:
+        head = _client().head_object(Bucket=default_storage.bucket_name, Key=_object_key(name))
+    except ClientError:
+        raise DirectUploadError('Uploaded file not found')
+
+    if not head.get('ContentType', '').startswith('image/'):
+        raise DirectUploadError('Uploaded file is not an image')
+    if head['ContentLength'] > settings.DIRECT_UPLOAD_MAX_BYTES:
+        default_storage.delete(name)
+        raise DirectUploadError('Uploaded file is too large')
+    return head
@@ -0,0 +1,125 @@
+"""
+Bulk import of template images from a directory or ZIP archive.
+
+Each immediate subfolder maps to a TemplateCategory of the same name; images
+at the top level get no category. Images are validated in parallel (see
+editor.image_inspection), then stored and inserted with ``bulk_create``. A
+bad file is recorded in the report and skipped, it never aborts the rest of
+the batch.
+"""
+
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .image_inspection import inspect_image, open_source
+from .models import Template, TemplateCategory
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.errors = []  # (path, message)
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        processed = self.created + len(self.errors)
+        return processed / self.elapsed if self.elapsed else 0.0
+
+
+def discover_images(path):
+    """List (archive, member_path, category_name) for every image under a directory or in a ZIP"""
+    sources = []
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            names = [info.filename for info in archive.infolist() if not info.is_dir()]
+        for name in names:
+            parts = [part for part in name.split('/') if part]
+            if any(part.startswith(('.', '__MACOSX')) for part in parts):
+                continue
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                sources.append((path, name, parts[0] if len(parts) > 1 else None))
+    else:
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            relative = os.path.relpath(root, path)
+            category = None if relative == '.' else relative.split(os.sep)[0]
+            for filename in sorted(files):
+                if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                    sources.append((None, os.path.join(root, filename), category))
+    return sources
+
+
+def _display_path(archive, member):
+    return f'{os.path.basename(archive)}:{member}' if archive else member
+
+
+def import_templates(path, uploaded_by=None, workers=None, batch_size=200, processes=True):
+    """
+    Import every image under ``path`` as an admin Template, returning an ImportReport.
+    Images are validated in a process pool, or a thread pool when ``processes``
+    is False (e.g. inside a web request, where forking a threaded server is unsafe).
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    sources = discover_images(path)
+
+    categories = {}
+    for name in sorted({category for _, _, category in sources if category}):
+        categories[name], created = TemplateCategory.objects.get_or_create(
+            name=name[:100],
+            defaults={'created_by': uploaded_by}
+        )
+
+    pending = []
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        results = executor.map(inspect_image, sources, chunksize=8)
+        for index, (archive, member, category) in enumerate(sources):
+            display_path = _display_path(archive, member)
+            try:
+                width, height, error = next(results)
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory); the rest of this run cannot be validated
+                report.errors.extend(
+                    (_display_path(archive, member), f'Image worker failed: {e}')
+                    for archive, member, category in sources[index:]
+                )
+                break
+            if error:
+                report.errors.append((display_path, error))
+                continue
+
+            filename = os.path.basename(member)
+            try:
+                with open_source(archive, member) as fileobj:
+                    stored_name = default_storage.save(f'templates/{filename}', File(fileobj, name=filename))
+            except OSError as e:
+                report.errors.append((display_path, f'Could not store image: {e}'))
+                continue
+
+            pending.append(Template(
+                name=os.path.splitext(filename)[0].replace('_', ' ').replace('-', ' ').strip()[:200] or filename,
+                image=stored_name,
+                image_width=width,
+                image_height=height,
+                category=categories.get(category),
+                uploaded_by=uploaded_by,
+                is_admin_template=True,
+            ))
+            if len(pending) >= batch_size:
+                report.created += len(Template.objects.bulk_create(pending))
+                pending = []
+
+    if pending:
+        report.created += len(Template.objects.bulk_create(pending))
+    report.elapsed = time.perf_counter() - start
+    return report
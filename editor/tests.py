@@ -1,3 +1,805 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from botocore.stub import Stubber
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connections
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .collab import CollaborationConsumer, Connection, InMemoryBroker, Room, RoomManager
+from .early_hints import EARLY_HINT_EXTENSION, EarlyHintsMiddleware
+from .exports import import_ndjson, iter_ndjson, iter_tarball
+from .middleware import PIN_COOKIE_NAME, ReadYourWritesMiddleware
+from .models import RECENT_USE_WINDOW, Template, UserDesign, UserUploadedImage
+from .routers import pinned_to_primary, wrote_to_primary
+from .sharing import ensure_share_image, share_image_name
+from .template_import import import_templates
+from .validators import (
+    CanvasValidationError, normalize_canvas_data, validate_canvas_data, validate_element, validate_save_design_payload,
+)
+from .views import save_design
+
+
+def text_element(**fields):
+    return {
+        'type': 'text', 'text': 'Hello', 'x': 10, 'y': 20,
+        'fontFamily': 'Arial', 'fontSize': 24, 'color': '#000000', **fields,
+    }
+
+
+def image_element(**fields):
+    return {'type': 'image', 'image': '/media/user_images/a.png', 'x': 0, 'y': 0, 'width': 100, 'height': 50, **fields}
+
+
+class TempMediaRootMixin:
+    """Point MEDIA_ROOT at a temporary directory for each test"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class EditorViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('editor', password='password')
+        self.client.force_login(self.user)
+        self.template = Template.objects.create(name='Card', image='templates/card.png', image_width=800, image_height=600)
+        self.design = UserDesign.objects.create(user=self.user, template=self.template, design_name='Mine', canvas_data={
+            'elements': [
+                image_element(image='/media/user_images/a.png'),
+                image_element(image='/media/user_images/a.png'),
+                image_element(image='data:image/png;base64,AAAA'),
+                text_element(),
+            ],
+        })
+
+    def get(self, url):
+        return self.client.get(url, SERVER_NAME='localhost')
+
+    def bootstrap(self, response):
+        match = re.search(rb'<script id="editor-bootstrap" type="application/json">(.*?)</script>', response.content)
+        return json.loads(match.group(1))
+
+    def test_bootstrap_embeds_design(self):
+        response = self.get(reverse('editor_design', args=[self.template.pk, self.design.pk]))
+        self.assertEqual(response.status_code, 200)
+        bootstrap = self.bootstrap(response)
+        self.assertEqual((bootstrap['template']['width'], bootstrap['template']['height']), (800, 600))
+        self.assertEqual(bootstrap['design']['canvas_data'], self.design.canvas_data)
+        self.assertEqual(bootstrap['element_images'], ['/media/user_images/a.png'])
+        self.assertIn('rel=preload; as=image', response['Link'])
+        self.assertIn('canvas-editor.js>; rel=preload; as=script', response['Link'])
+
+    def test_blank_editor(self):
+        bootstrap = self.bootstrap(self.get(reverse('editor', args=[self.template.pk])))
+        self.assertIsNone(bootstrap['design'])
+        self.assertEqual(bootstrap['element_images'], [])
+
+    def test_legacy_design_id_query(self):
+        response = self.get(reverse('editor', args=[self.template.pk]) + f'?design_id={self.design.pk}')
+        self.assertEqual(self.bootstrap(response)['design']['id'], self.design.pk)
+
+    def test_design_opens_over_its_own_template(self):
+        other = Template.objects.create(name='Poster', image='templates/poster.png')
+        response = self.get(reverse('editor_design', args=[other.pk, self.design.pk]))
+        self.assertRedirects(
+            response, reverse('editor_design', args=[self.template.pk, self.design.pk]), fetch_redirect_response=False,
+        )
+
+    def test_unavailable_designs(self):
+        stranger = User.objects.create_user('stranger', password='password')
+        theirs = UserDesign.objects.create(user=stranger, template=self.template, design_name='Theirs', canvas_data={})
+        orphan = UserDesign.objects.create(user=self.user, design_name='Orphan', canvas_data={})
+        for design in (theirs, orphan):
+            with self.subTest(design=design.design_name):
+                response = self.get(reverse('editor_design', args=[self.template.pk, design.pk]))
+                self.assertEqual(response.status_code, 404)
+
+
+class EarlyHintsMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.responses = []
+
+    async def app(self, scope, receive, send):
+        status, headers = self.responses.pop(0)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def request(self, middleware, path, session=True, extensions=True, response=(200, [])):
+        self.responses.append(response)
+        headers = [(b'cookie', b'sessionid=abc')] if session else []
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': path, 'headers': headers,
+            'extensions': {EARLY_HINT_EXTENSION: {}} if extensions else {},
+        }
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, None, send)
+        return [message['links'] for message in sent if message['type'] == EARLY_HINT_EXTENSION]
+
+    async def test_replays_last_link_header(self):
+        middleware = EarlyHintsMiddleware(self.app)
+        linked = (200, [(b'Link', b'</a.png>; rel=preload, </b.js>; rel=preload')])
+        self.assertEqual(await self.request(middleware, '/editor/1/', response=linked), [])
+        self.assertEqual(
+            await self.request(middleware, '/editor/1/'), [[b'</a.png>; rel=preload', b'</b.js>; rel=preload']],
+        )
+        # That 200 had no Link header, so the hint is forgotten
+        self.assertEqual(await self.request(middleware, '/editor/1/'), [])
+
+    async def test_redirects_neither_store_nor_evict(self):
+        middleware = EarlyHintsMiddleware(self.app)
+        await self.request(middleware, '/editor/1/', response=(200, [(b'Link', b'</a.png>; rel=preload')]))
+        await self.request(middleware, '/editor/1/', response=(302, [(b'Link', b'</login.js>; rel=preload')]))
+        self.assertEqual(await self.request(middleware, '/editor/1/'), [[b'</a.png>; rel=preload']])
+
+    async def test_only_sessions_on_supporting_servers_get_hints(self):
+        middleware = EarlyHintsMiddleware(self.app)
+        await self.request(middleware, '/editor/1/', response=(200, [(b'Link', b'</a.png>; rel=preload')]))
+        self.assertEqual(await self.request(middleware, '/editor/1/', session=False, response=(302, [])), [])
+        self.assertEqual(await self.request(middleware, '/editor/1/', extensions=False), [])
+        self.assertEqual(len(await self.request(middleware, '/editor/1/')), 1)
+
+    async def test_least_recently_used_path_is_evicted(self):
+        middleware = EarlyHintsMiddleware(self.app, max_paths=2)
+        for path in ('/a/', '/b/', '/c/'):
+            await self.request(middleware, path, response=(200, [(b'Link', path.encode())]))
+        self.assertEqual(list(middleware._links), ['/b/', '/c/'])
+
+
+class CanvasValidatorTests(TestCase):
+    def assertRejected(self, element, path):
+        with self.assertRaises(CanvasValidationError) as cm:
+            validate_element(element, 'element')
+        self.assertEqual(cm.exception.path, path)
+
+    def test_valid_elements(self):
+        validate_element(text_element(id='el-1', rotation=45))
+        validate_element(image_element(originalAspectRatio=2.0))
+        validate_canvas_data({'elements': [text_element(), image_element()]})
+        validate_canvas_data({})
+
+    def test_unknown_type(self):
+        self.assertRejected({'type': 'video'}, 'element.type')
+
+    def test_missing_required_field(self):
+        element = text_element()
+        del element['fontSize']
+        self.assertRejected(element, 'element.fontSize')
+
+    def test_wrong_field_type(self):
+        self.assertRejected(text_element(x='10'), 'element.x')
+        self.assertRejected(text_element(x=True), 'element.x')
+        self.assertRejected(text_element(text=42), 'element.text')
+        self.assertRejected(text_element(x=float('nan')), 'element.x')
+
+    def test_out_of_range(self):
+        self.assertRejected(text_element(fontSize=0), 'element.fontSize')
+        self.assertRejected(text_element(rotation=720), 'element.rotation')
+        self.assertRejected(image_element(width=-1), 'element.width')
+
+    def test_invalid_format(self):
+        self.assertRejected(text_element(color='red'), 'element.color')
+        self.assertRejected(text_element(id='has spaces'), 'element.id')
+
+    def test_unknown_field(self):
+        self.assertRejected(text_element(onclick='alert(1)'), 'element.onclick')
+
+    def test_data_url_image(self):
+        self.assertRejected(image_element(image='data:image/png;base64,AAAA'), 'element.image')
+        self.assertRejected(image_element(image='javascript:alert(1)'), 'element.image')
+
+    @override_settings(EDITOR_CANVAS_MAX_ELEMENTS=2, EDITOR_CANVAS_MAX_TEXT_LENGTH=3)
+    def test_limits_follow_settings(self):
+        validate_canvas_data({'elements': [text_element(text='abc')] * 2})
+        with self.assertRaises(CanvasValidationError) as cm:
+            validate_canvas_data({'elements': [text_element(text='abc')] * 3})
+        self.assertEqual(cm.exception.path, 'canvas_data.elements')
+        self.assertRejected(text_element(text='abcd'), 'element.text')
+
+    def test_normalize_drops_legacy_fields(self):
+        legacy = {'elements': [
+            image_element(imageData=None, rotation=None, originalAspectRatio=2.0),
+            text_element(selected=True),
+            {'type': 'video', 'src': 'x'},
+        ]}
+        normalized = normalize_canvas_data(legacy)
+        self.assertEqual(normalized['elements'][:2], [image_element(originalAspectRatio=2.0), text_element()])
+        # Unknown types are left for validation to reject
+        self.assertEqual(normalized['elements'][2], {'type': 'video', 'src': 'x'})
+        self.assertIn('imageData', legacy['elements'][0])
+        validate_canvas_data({'elements': normalized['elements'][:2]})
+
+    def test_canvas_shape(self):
+        for canvas_data, path in [
+            ([], 'canvas_data'),
+            ({'elements': [], 'script': ''}, 'canvas_data'),
+            ({'elements': {}}, 'canvas_data.elements'),
+            ({'elements': [text_element(), 'x']}, 'canvas_data.elements[1]'),
+        ]:
+            with self.subTest(canvas_data=canvas_data):
+                with self.assertRaises(CanvasValidationError) as cm:
+                    validate_canvas_data(canvas_data)
+                self.assertEqual(cm.exception.path, path)
+
+    def test_save_design_payload(self):
+        payload = {'design_name': 'Card', 'template_id': 1, 'canvas_data': {'elements': []}}
+        validate_save_design_payload(payload)
+        for changes, path in [
+            ({'design_name': ' '}, 'design_name'),
+            ({'design_name': 'x' * 201}, 'design_name'),
+            ({'template_id': True}, 'template_id'),
+            ({'design_id': 'abc'}, 'design_id'),
+            ({'preview_image': 'data:image/svg+xml;base64,AAAA'}, 'preview_image'),
+        ]:
+            with self.subTest(changes=changes):
+                with self.assertRaises(CanvasValidationError) as cm:
+                    validate_save_design_payload({**payload, **changes})
+                self.assertEqual(cm.exception.path, path)
+
+
+class SaveDesignViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('designer', password='password')
+        self.client.force_login(self.user)
+        self.url = reverse('save_design')
+
+    def post(self, body):
+        return self.client.post(self.url, body, content_type='application/json', SERVER_NAME='localhost')
+
+    def test_invalid_json(self):
+        response = self.post('{not json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_schema_violation(self):
+        response = self.post(json.dumps({
+            'design_name': 'Card', 'template_id': 1,
+            'canvas_data': {'elements': [text_element(fontSize='huge')]},
+        }))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['field'], 'canvas_data.elements[0].fontSize')
+
+    def test_missing_template(self):
+        response = self.post(json.dumps({'design_name': 'Card', 'template_id': 999, 'canvas_data': {'elements': []}}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_declared_length_too_large(self):
+        with override_settings(EDITOR_SAVE_DESIGN_MAX_BYTES=100):
+            response = self.post(json.dumps({'design_name': 'x' * 200}))
+        self.assertEqual(response.status_code, 413)
+
+    def test_undeclared_length_too_large(self):
+        # A chunked body under ASGI arrives with no Content-Length
+        request = AsyncRequestFactory().post(self.url, json.dumps({'design_name': 'x' * 200}), content_type='application/json')
+        del request.META['CONTENT_LENGTH']
+        request.user = self.user
+        with override_settings(EDITOR_SAVE_DESIGN_MAX_BYTES=100):
+            response = save_design(request)
+        self.assertEqual(response.status_code, 413)
+
+    def test_wrong_method(self):
+        response = self.client.get(self.url, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 405)
+
+
+@override_settings(DATABASE_REPLICAS=['test_replica'])
+class ReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # The replica is an alias of the default connection, sharing its test
+        # transaction, so it sees the rows each test creates without needing a
+        # second database in settings or waiting on SQLite table locks
+        connections['test_replica'] = connections['default']
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        del connections['test_replica']
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='password')
+        # Creating the user pinned this context; start every test unpinned
+        pinned_token, wrote_token = pinned_to_primary.set(False), wrote_to_primary.set(False)
+        self.addCleanup(pinned_to_primary.reset, pinned_token)
+        self.addCleanup(wrote_to_primary.reset, wrote_token)
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(User.objects.get(pk=self.user.pk)._state.db, 'test_replica')
+
+    def test_write_pins_rest_of_request(self):
+        self.assertEqual(User.objects.all().db, 'test_replica')
+        self.user.save()
+        self.assertEqual(User.objects.all().db, 'default')
+
+    def run_middleware(self, view, cookie=None):
+        request = RequestFactory().get('/')
+        if cookie is not None:
+            request.COOKIES[PIN_COOKIE_NAME] = cookie
+        return ReadYourWritesMiddleware(view)(request)
+
+    def test_write_sets_pin_cookie(self):
+        def view(request):
+            User.objects.filter(pk=self.user.pk).update(first_name='Ann')
+            return HttpResponse()
+
+        response = self.run_middleware(view)
+        self.assertGreater(float(response.cookies[PIN_COOKIE_NAME].value), time.time())
+        # The pin does not leak out of the request
+        self.assertEqual(User.objects.all().db, 'test_replica')
+
+    def test_read_only_request_sets_no_cookie(self):
+        response = self.run_middleware(lambda request: HttpResponse(User.objects.count()))
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+
+    def test_pin_cookie_is_honoured(self):
+        def view(request):
+            return HttpResponse(User.objects.all().db)
+
+        self.assertEqual(self.run_middleware(view, str(time.time() + 60)).content, b'default')
+        self.assertEqual(self.run_middleware(view, str(time.time() - 60)).content, b'test_replica')
+        self.assertEqual(self.run_middleware(view, 'garbage').content, b'test_replica')
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'storages.backends.s3.S3Storage', 'OPTIONS': {
+        'bucket_name': 'media', 'access_key': 'test', 'secret_key': 'test', 'region_name': 'us-east-1',
+    }},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class DirectUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('uploader', password='password')
+        self.client.force_login(self.user)
+        self.stubber = Stubber(default_storage.connection.meta.client)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+
+    def post(self, name, body):
+        return self.client.post(reverse(name), json.dumps(body), content_type='application/json', SERVER_NAME='localhost')
+
+    def complete(self, key, **head):
+        if head:
+            self.stubber.add_response('head_object', head, {'Bucket': 'media', 'Key': key})
+        return self.post('complete_upload', {'kind': 'user_image', 'key': key})
+
+    def test_presign_scopes_key_and_conditions(self):
+        response = self.post('presign_upload', {'filename': 'Photo.PNG', 'content_type': 'image/png'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertRegex(data['key'], rf'^user_images/{self.user.pk}/[0-9a-f]{{32}}\.png$')
+        self.assertEqual(data['fields']['key'], data['key'])
+        policy = json.loads(base64.b64decode(data['fields']['policy']))
+        self.assertIn({'Content-Type': 'image/png'}, policy['conditions'])
+        self.assertIn(['content-length-range', 1, 10485760], policy['conditions'])
+
+    def test_presign_rejects_bad_requests(self):
+        for body in [
+            {'filename': 'script.js', 'content_type': 'image/png'},
+            {'filename': 'photo.png', 'content_type': 'text/html'},
+            {'filename': 42, 'content_type': 'image/png'},
+            {'filename': 'photo.png', 'content_type': 'image/png', 'kind': ['user_image']},
+            {'filename': 'photo.png', 'content_type': 'image/png', 'kind': 'avatar'},
+        ]:
+            with self.subTest(body=body):
+                self.assertEqual(self.post('presign_upload', body).status_code, 400)
+
+    def test_complete_records_verified_upload(self):
+        key = f'user_images/{self.user.pk}/abc.png'
+        response = self.complete(key, ContentType='image/png', ContentLength=1024)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(UserUploadedImage.objects.get(user=self.user).image.name, key)
+        self.stubber.assert_no_pending_responses()
+
+    def test_complete_rejects_foreign_keys(self):
+        other = User.objects.create_user('other', password='password')
+        for key in [f'user_images/{other.pk}/abc.png', f'user_images/{self.user.pk}/../{other.pk}/abc.png', 'abc.png']:
+            with self.subTest(key=key):
+                self.assertEqual(self.complete(key).status_code, 403)
+        self.assertEqual(self.post('complete_upload', {'kind': ['user_image'], 'key': 'x'}).status_code, 400)
+        self.assertEqual(self.post('complete_upload', {'key': 42}).status_code, 400)
+
+    def test_complete_requires_uploaded_image(self):
+        key = f'user_images/{self.user.pk}/abc.png'
+        self.stubber.add_client_error('head_object', '404', http_status_code=404)
+        self.assertEqual(self.complete(key).status_code, 400)
+        self.assertEqual(self.complete(key, ContentType='text/html', ContentLength=10).status_code, 400)
+        self.assertFalse(UserUploadedImage.objects.exists())
+
+    def test_oversized_upload_is_deleted(self):
+        key = f'user_images/{self.user.pk}/abc.png'
+        self.stubber.add_response('head_object', {'ContentType': 'image/png', 'ContentLength': 10485761})
+        self.stubber.add_response('delete_object', {}, {'Bucket': 'media', 'Key': key})
+        self.assertEqual(self.complete(key).status_code, 400)
+        self.stubber.assert_no_pending_responses()
+        self.assertFalse(UserUploadedImage.objects.exists())
+
+
+class TemplateUsageCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('counter', password='password')
+        self.template = Template.objects.create(name='Card', image='templates/card.png', is_admin_template=True)
+
+    def design(self, age=None):
+        design = UserDesign.objects.create(user=self.user, template=self.template, design_name='Card', canvas_data={})
+        if age is not None:
+            UserDesign.objects.filter(pk=design.pk).update(created_at=timezone.now() - age)
+            design.refresh_from_db()
+        return design
+
+    def counters(self, template=None):
+        template = template or self.template
+        template.refresh_from_db()
+        return template.use_count, template.recent_use_count
+
+    def test_create_and_delete(self):
+        recent, old = self.design(), self.design(age=RECENT_USE_WINDOW + timedelta(days=1))
+        self.assertEqual(self.counters(), (2, 2))
+        recent.delete()
+        self.assertEqual(self.counters(), (1, 1))
+        # Created outside the window, so it no longer counts as recent
+        old.delete()
+        self.assertEqual(self.counters(), (0, 1))
+
+    def test_counters_never_go_negative(self):
+        design = self.design()
+        Template.objects.filter(pk=self.template.pk).update(use_count=0, recent_use_count=0)
+        design.delete()
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_reconcile_fixes_drift(self):
+        self.design()
+        self.design(age=RECENT_USE_WINDOW + timedelta(days=1))
+        correct = Template.objects.create(name='Poster', image='templates/poster.png')
+        UserDesign.objects.create(user=self.user, template=correct, design_name='Poster', canvas_data={})
+        # The old design has aged out of the window since it was counted
+        self.assertEqual(self.counters(), (2, 2))
+        Template.objects.filter(pk=self.template.pk).update(use_count=7)
+
+        out = StringIO()
+        call_command('reconcile_template_usage', stdout=out)
+        self.assertIn('1 template(s)', out.getvalue())
+        self.assertEqual(self.counters(), (2, 1))
+        self.assertEqual(self.counters(correct), (1, 1))
+
+    def test_popular_and_trending_sorts(self):
+        popular = Template.objects.create(name='Popular', image='templates/p.png', is_admin_template=True)
+        trending = Template.objects.create(name='Trending', image='templates/t.png', is_admin_template=True)
+        Template.objects.filter(pk=popular.pk).update(use_count=10, recent_use_count=1)
+        Template.objects.filter(pk=trending.pk).update(use_count=5, recent_use_count=5)
+        self.client.force_login(self.user)
+
+        for sort, expected in [('popular', ['Popular', 'Trending', 'Card']), ('trending', ['Trending', 'Popular', 'Card'])]:
+            with self.subTest(sort=sort):
+                response = self.client.get(reverse('template_list'), {'sort': sort}, SERVER_NAME='localhost')
+                self.assertEqual([template.name for template in response.context['admin_templates']], expected)
+
+
+class TemplateImageDimensionTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.user = User.objects.create_user('uploader', password='password')
+        self.client.force_login(self.user)
+
+    def test_missing_image_file_does_not_break_listing(self):
+        # Rows the 0003 backfill could not read keep NULL dimensions
+        Template.objects.create(name='Lost', image='templates/missing.png', is_admin_template=True)
+        response = self.client.get(reverse('template_list'), SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+
+    def test_form_upload_records_dimensions(self):
+        image = BytesIO()
+        Image.new('RGB', (40, 30)).save(image, 'PNG')
+        upload = SimpleUploadedFile('card.png', image.getvalue(), content_type='image/png')
+        response = self.client.post(reverse('template_upload'), {'name': 'Card', 'image': upload}, SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 302)
+        template = Template.objects.get(name='Card')
+        self.assertEqual((template.image_width, template.image_height), (40, 30))
+
+
+class DesignImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('exporter', password='password')
+        self.template = Template.objects.create(name='Card', image='templates/card.png')
+
+    def export_lines(self):
+        return b''.join(iter_ndjson(UserDesign.objects.all())).decode().splitlines()
+
+    def assertImported(self, lines, created, skipped, owner=None):
+        report = import_ndjson(lines, owner=owner)
+        self.assertEqual((report.created, report.skipped, report.errors), (created, skipped, []))
+
+    def test_reimport_skips_existing_designs(self):
+        UserDesign.objects.create(user=self.user, template=self.template, design_name='A', canvas_data={'elements': []})
+        UserDesign.objects.create(user=self.user, template=self.template, design_name='B', canvas_data={'elements': []})
+        self.assertImported(self.export_lines(), 0, 2)
+        self.assertEqual(UserDesign.objects.count(), 2)
+
+    def test_another_owner_gets_a_copy(self):
+        UserDesign.objects.create(user=self.user, template=self.template, design_name='A', canvas_data={'elements': []})
+        other = User.objects.create_user('importer', password='password')
+        lines = self.export_lines()
+        self.assertImported(lines, 1, 0, owner=other)
+        self.assertImported(lines, 0, 1, owner=other)
+
+    def test_invalid_records_are_reported(self):
+        record = {
+            'key': str(uuid.uuid4()), 'user': 'exporter', 'design_name': 'Bad',
+            'canvas_data': {'elements': [image_element(image='data:image/png;base64,AAAA')]},
+        }
+        keyless = {**record, 'key': None}
+        report = import_ndjson([json.dumps(record), '{not json', '', '[]', json.dumps(keyless)])
+        self.assertEqual((report.created, report.skipped), (0, 0))
+        errors = dict(report.errors)
+        self.assertCountEqual(errors, [record['key'], 'line 2', 'line 4', 'line 5'])
+        self.assertIn('canvas_data.elements[0].image', errors[record['key']])
+        self.assertFalse(UserDesign.objects.exists())
+
+    def test_legacy_fields_are_dropped(self):
+        record = {
+            'key': str(uuid.uuid4()), 'user': 'exporter', 'design_name': 'Legacy',
+            'canvas_data': {'elements': [image_element(imageData=None), text_element(rotation=None)]},
+        }
+        self.assertImported([json.dumps(record)], 1, 0)
+        design = UserDesign.objects.get(export_key=record['key'])
+        self.assertEqual(design.canvas_data, {'elements': [image_element(), text_element()]})
+
+    def test_template_matched_by_image_not_id(self):
+        other = Template.objects.create(name='Poster', image='templates/poster.png')
+        record = {
+            'key': str(uuid.uuid4()), 'user': 'exporter', 'design_name': 'Moved',
+            'template_id': self.template.pk, 'template_image': 'templates/poster.png',
+            'canvas_data': {'elements': []},
+        }
+        unknown = {**record, 'key': str(uuid.uuid4()), 'template_image': 'templates/gone.png'}
+        self.assertImported([json.dumps(record), json.dumps(unknown)], 2, 0)
+        self.assertEqual(UserDesign.objects.get(export_key=record['key']).template, other)
+        self.assertIsNone(UserDesign.objects.get(export_key=unknown['key']).template)
+
+    def test_tarball_skips_media_outside_storage(self):
+        UserDesign.objects.create(user=self.user, design_name='Escape', canvas_data={'elements': [
+            image_element(image='/media/../settings.py'),
+            image_element(image='/media/user_images/missing.png'),
+        ]})
+        with tarfile.open(fileobj=BytesIO(b''.join(iter_tarball(UserDesign.objects.all()))), mode='r:gz') as tar:
+            self.assertEqual(tar.getnames(), ['designs.ndjson'])
+
+
+class TemplateImportTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        os.mkdir(os.path.join(self.source, 'Cards'))
+        Image.new('RGB', (30, 20)).save(os.path.join(self.source, 'Cards', 'birthday.png'))
+        Image.new('RGB', (10, 10)).save(os.path.join(self.source, 'plain.jpg'))
+        with open(os.path.join(self.source, 'Cards', 'broken.png'), 'wb') as f:
+            f.write(b'not an image')
+
+    def test_bad_files_are_reported_not_fatal(self):
+        report = import_templates(self.source, processes=False)
+        self.assertEqual(report.created, 2)
+        self.assertEqual([os.path.basename(path) for path, message in report.errors], ['broken.png'])
+        template = Template.objects.get(category__name='Cards')
+        self.assertEqual((template.image_width, template.image_height), (30, 20))
+
+    def test_broken_process_pool_is_reported(self):
+        class CrashingPool(ThreadPoolExecutor):
+            def map(self, fn, iterable, chunksize=1):
+                iterable = list(iterable)
+                yield fn(iterable[0])
+                raise BrokenProcessPool('worker was killed')
+
+        with mock.patch('editor.template_import.ProcessPoolExecutor', CrashingPool):
+            report = import_templates(self.source)
+        self.assertEqual(report.created, 1)
+        self.assertEqual(len(report.errors), 2)
+        self.assertTrue(all('worker was killed' in message for path, message in report.errors))
+
+
+class ShareDesignTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.user = User.objects.create_user('sharer', password='password')
+        self.client.force_login(self.user)
+        self.design = UserDesign.objects.create(user=self.user, design_name='Card', canvas_data={'elements': []})
+
+    def share(self, days):
+        url = reverse('share_design', args=[self.design.pk])
+        return self.client.post(url, {'expires_in_days': days}, SERVER_NAME='localhost')
+
+    def test_expiry_must_not_be_negative(self):
+        self.assertEqual(self.share('-1').status_code, 400)
+        self.assertEqual(self.share('soon').status_code, 400)
+        self.assertEqual(self.share('0').status_code, 200)
+        self.assertEqual(self.share('7').status_code, 200)
+
+    def test_concurrent_render_leaves_no_duplicate_image(self):
+        image = BytesIO()
+        Image.new('RGB', (20, 20)).save(image, 'PNG')
+        self.design.preview_image = SimpleUploadedFile('card.png', image.getvalue())
+        self.design.save()
+
+        # Another request stores the image between this one's exists() check and save()
+        name = share_image_name(self.design)
+        default_storage.save(name, ContentFile(b'first'))
+        real_exists, stale = default_storage.exists, [name, name]
+
+        def exists(candidate):
+            if candidate in stale:
+                stale.remove(candidate)
+                return False
+            return real_exists(candidate)
+
+        with mock.patch.object(default_storage, 'exists', exists):
+            self.assertEqual(ensure_share_image(self.design), name)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'shared_designs')), [os.path.basename(name)])
+
+    def test_new_version_replaces_older_images(self):
+        image = BytesIO()
+        Image.new('RGB', (20, 20)).save(image, 'PNG')
+        self.design.preview_image = SimpleUploadedFile('card.png', image.getvalue())
+        self.design.save()
+        old_name = ensure_share_image(self.design)
+        other = UserDesign.objects.create(user=self.user, design_name='Other', canvas_data={'elements': []})
+        unrelated = [
+            default_storage.save(f'shared_designs/{other.pk}-1.jpg', ContentFile(b'other design')),
+            default_storage.save(f'shared_designs/{self.design.pk}1-1.jpg', ContentFile(b'other design')),
+        ]
+
+        UserDesign.objects.filter(pk=self.design.pk).update(updated_at=self.design.updated_at + timedelta(seconds=5))
+        self.design.refresh_from_db()
+        new_name = ensure_share_image(self.design)
+        self.assertNotEqual(new_name, old_name)
+        self.assertCountEqual(
+            os.listdir(os.path.join(self.media_root, 'shared_designs')),
+            [os.path.basename(name) for name in [new_name, *unrelated]],
+        )
+
+
+class CollaborationRoomTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('collaborator', password='password')
+        self.design = UserDesign.objects.create(user=self.user, design_name='Card', canvas_data={
+            'elements': [text_element(), text_element(text='Second')],
+        })
+
+    def connection(self):
+        async def send(message):
+            pass
+        return Connection(send)
+
+    async def test_legacy_element_ids_are_persisted_before_the_room_opens(self):
+        # Two managers stand in for two server processes sharing a broker
+        broker = InMemoryBroker()
+        managers = [RoomManager(broker), RoomManager(broker)]
+        first, second = [await manager.join(self.design.pk, self.connection()) for manager in managers]
+        for manager, room in zip(managers, (first, second)):
+            self.addCleanup(async_to_sync(manager.leave), room, next(iter(room.connections)))
+
+        ids = [element['id'] for element in first.elements]
+        self.assertTrue(all(ids))
+        self.assertEqual([element['id'] for element in second.elements], ids)
+        design = await UserDesign.objects.aget(pk=self.design.pk)
+        self.assertEqual([element['id'] for element in design.canvas_data['elements']], ids)
+
+    async def test_legacy_fields_are_dropped_on_load(self):
+        legacy = image_element(imageData=None, rotation=None)
+        await UserDesign.objects.filter(pk=self.design.pk).aupdate(canvas_data={'elements': [legacy]})
+        manager = RoomManager(InMemoryBroker())
+        connection = self.connection()
+        room = await manager.join(self.design.pk, connection)
+        self.addCleanup(async_to_sync(manager.leave), room, connection)
+
+        element_id = room.elements[0]['id']
+        self.assertEqual(room.elements, [image_element(id=element_id)])
+        op = room.check_op({'action': 'update', 'id': element_id, 'changes': {'x': 5}})
+        self.assertEqual(op['changes'], {'x': 5})
+        design = await UserDesign.objects.aget(pk=self.design.pk)
+        self.assertEqual(design.canvas_data['elements'], room.elements)
+
+    async def test_update_cannot_swap_image(self):
+        await UserDesign.objects.filter(pk=self.design.pk).aupdate(canvas_data={'elements': [image_element(id='img')]})
+        manager = RoomManager(InMemoryBroker())
+        connection = self.connection()
+        room = await manager.join(self.design.pk, connection)
+        self.addCleanup(async_to_sync(manager.leave), room, connection)
+        with self.assertRaises(CanvasValidationError):
+            room.check_op({'action': 'update', 'id': 'img', 'changes': {'image': '/media/user_images/b.png'}})
+
+    async def test_loading_one_design_does_not_block_others(self):
+        manager = RoomManager(InMemoryBroker())
+        first = self.connection()
+        room = await manager.join(self.design.pk, first)
+        other = await UserDesign.objects.acreate(user=self.user, design_name='Other', canvas_data={'elements': []})
+        loading, release = threading.Event(), threading.Event()
+
+        def slow_load(design_id):
+            loading.set()
+            release.wait(5)
+            return []
+
+        with mock.patch('editor.collab.load_elements', slow_load):
+            opening = asyncio.create_task(manager.join(other.pk, self.connection()))
+            await sync_to_async(loading.wait, thread_sensitive=False)(5)
+            try:
+                second = self.connection()
+                self.assertIs(await asyncio.wait_for(manager.join(self.design.pk, second), 1), room)
+            finally:
+                release.set()
+            other_room = await opening
+        for target, connection in [(room, first), (room, second), (other_room, next(iter(other_room.connections)))]:
+            await manager.leave(target, connection)
+
+    async def test_rejoin_waits_for_final_flush(self):
+        manager = RoomManager(InMemoryBroker())
+        leaving = self.connection()
+        room = await manager.join(self.design.pk, leaving)
+        element_id = room.elements[0]['id']
+        await room.broker.publish(room.channel, {
+            'sender': leaving.id, 'client_op_id': '1', 'op': {'action': 'update', 'id': element_id, 'changes': {'x': 99}},
+        })
+
+        original_flush = Room.flush
+
+        async def slow_flush(room):
+            await asyncio.sleep(0.05)
+            await original_flush(room)
+
+        with mock.patch.object(Room, 'flush', slow_flush):
+            # The sole editor reloads the page: leave and rejoin race
+            left, rejoined = await asyncio.gather(
+                manager.leave(room, leaving), manager.join(self.design.pk, self.connection()),
+            )
+        self.assertIsNot(rejoined, room)
+        self.assertEqual(rejoined.elements[0]['x'], 99)
+        await manager.leave(rejoined, next(iter(rejoined.connections)))
+
+    async def test_sync_resends_snapshot(self):
+        manager = RoomManager(InMemoryBroker())
+        connection = self.connection()
+        room = await manager.join(self.design.pk, connection)
+        connection.queue.get_nowait()  # initial snapshot
+
+        await CollaborationConsumer(manager).handle_text(room, connection, json.dumps({
+            'type': 'op', 'client_op_id': 'bad', 'op': {'action': 'remove', 'id': 'missing'},
+        }))
+        await CollaborationConsumer(manager).handle_text(room, connection, json.dumps({'type': 'sync'}))
+        error, snapshot = json.loads(connection.queue.get_nowait()), json.loads(connection.queue.get_nowait())
+        self.assertEqual((error['type'], error['client_op_id']), ('error', 'bad'))
+        self.assertEqual(snapshot['type'], 'snapshot')
+        self.assertEqual(len(snapshot['elements']), 2)
+        await manager.leave(room, connection)
@@ -5,9 +5,16 @@ urlpatterns = [
     path('', views.template_list, name='template_list'),
     path('upload/', views.template_upload, name='template_upload'),
     path('editor/<int:template_id>/', views.editor_view, name='editor'),
+    path('editor/<int:template_id>/design/<int:design_id>/', views.editor_view, name='editor_design'),
     path('upload-image/', views.upload_user_image, name='upload_user_image'),
+    path('uploads/presign/', views.presign_upload, name='presign_upload'),
+    path('uploads/complete/', views.complete_upload, name='complete_upload'),
     path('save-design/', views.save_design, name='save_design'),
     path('my-designs/', views.my_designs, name='my_designs'),
+    path('my-designs/export/', views.export_designs, name='export_designs'),
     path('load-design/<int:design_id>/', views.load_design, name='load_design'),
     path('delete-design/<int:design_id>/', views.delete_design, name='delete_design'),
+    path('share-design/<int:design_id>/', views.share_design, name='share_design'),
+    path('s/<str:token>/', views.shared_design, name='shared_design'),
+    path('s/<str:token>/image/', views.shared_design_image, name='shared_design_image'),
 ]
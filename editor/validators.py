@@ -0,0 +1,216 @@
+"""
+Validation for the JSON documents posted to ``save_design``.
+
+The canvas schema is compiled once at import time into a table of per-field
+checker functions, so validating a document is a single pass over its
+elements with no schema interpretation on the hot path. The configurable
+limits are read from settings on each call so they follow ``override_settings``.
+"""
+
+import math
+import re
+
+from django.conf import settings
+
+MAX_URL_LENGTH = 2048
+MAX_DESIGN_NAME_LENGTH = 200  # UserDesign.design_name max_length
+MAX_COORDINATE = 100000
+
+COLOR_RE = re.compile(r'^#(?:[0-9a-fA-F]{3}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})$')
+FONT_FAMILY_RE = re.compile(r'^[\w \-,\'"]{1,100}$')
+PREVIEW_IMAGE_RE = re.compile(r'^data:image/(png|jpeg|webp);base64,')
+
+
+def max_save_design_bytes():
+    return getattr(settings, 'EDITOR_SAVE_DESIGN_MAX_BYTES', 5 * 1024 * 1024)
+
+
+def max_elements():
+    return getattr(settings, 'EDITOR_CANVAS_MAX_ELEMENTS', 500)
+
+
+def max_text_length():
+    return getattr(settings, 'EDITOR_CANVAS_MAX_TEXT_LENGTH', 5000)
+
+
+def max_preview_image_length():
+    return getattr(settings, 'EDITOR_MAX_PREVIEW_IMAGE_LENGTH', 4 * 1024 * 1024)
+
+
+class CanvasValidationError(ValueError):
+    """Raised when a save_design payload does not match the canvas schema"""
+
+    def __init__(self, path, message):
+        self.path = path
+        super().__init__(f'{path}: {message}')
+
+
+def _number(low, high):
+    def check(value, path):
+        # bool is an int subclass but never a valid coordinate
+        if type(value) not in (int, float) or not math.isfinite(value):
+            raise CanvasValidationError(path, 'must be a number')
+        if not low <= value <= high:
+            raise CanvasValidationError(path, f'must be between {low} and {high}')
+    return check
+
+
+def _string(max_length, pattern=None):
+    """max_length is a number, or a function returning one for limits read from settings"""
+    def check(value, path):
+        if not isinstance(value, str):
+            raise CanvasValidationError(path, 'must be a string')
+        limit = max_length() if callable(max_length) else max_length
+        if len(value) > limit:
+            raise CanvasValidationError(path, f'must be at most {limit} characters')
+        if pattern is not None and not pattern.match(value):
+            raise CanvasValidationError(path, 'has an invalid format')
+    return check
+
+
+_url_string = _string(MAX_URL_LENGTH)
+
+
+def _image_url(value, path):
+    _url_string(value, path)
+    if value.startswith('data:'):
+        raise CanvasValidationError(path, 'inline data URLs are not allowed, upload the image instead')
+    if not value.startswith(('/', 'http://', 'https://')):
+        raise CanvasValidationError(path, 'must be an http(s) or site-relative URL')
+
+
+_coordinate = _number(-MAX_COORDINATE, MAX_COORDINATE)
+_size = _number(0, MAX_COORDINATE)
+# Stable element ids used by collaborative editing ops (see editor/collab.py)
+_element_id = _string(64, re.compile(r'^[\w-]+$'))
+
+# element type -> (required fields, optional fields), each mapping name -> checker
+ELEMENT_SCHEMAS = {
+    'text': (
+        {
+            'text': _string(max_text_length),
+            'x': _coordinate,
+            'y': _coordinate,
+            'fontFamily': _string(100, FONT_FAMILY_RE),
+            'fontSize': _number(1, 1000),
+            'color': _string(9, COLOR_RE),
+        },
+        {
+            'id': _element_id,
+            'rotation': _number(-360, 360),
+        },
+    ),
+    'image': (
+        {
+            'image': _image_url,
+            'x': _coordinate,
+            'y': _coordinate,
+            'width': _size,
+            'height': _size,
+        },
+        {
+            'id': _element_id,
+            'rotation': _number(-360, 360),
+            'originalAspectRatio': _number(0, MAX_COORDINATE),
+        },
+    ),
+}
+
+_COMPILED_SCHEMAS = {
+    element_type: (required, {**required, **optional})
+    for element_type, (required, optional) in ELEMENT_SCHEMAS.items()
+}
+
+
+def normalize_element(element):
+    """
+    Copy of a stored element without the fields its schema does not allow.
+
+    Designs saved by older editors carry leftovers such as ``imageData`` or
+    null optional fields; the browser drops these when it rebuilds the element
+    (see createElement in canvas-editor.js), so the server does the same before
+    validating. Anything that is not a known element type is returned as is.
+    """
+    schema = _COMPILED_SCHEMAS.get(element.get('type')) if isinstance(element, dict) else None
+    if schema is None:
+        return element
+    required, allowed = schema
+    return {
+        name: value for name, value in element.items()
+        if name == 'type' or name in required or (name in allowed and value is not None)
+    }
+
+
+def normalize_canvas_data(canvas_data):
+    """Copy of a stored canvas document with every element passed through normalize_element"""
+    if not isinstance(canvas_data, dict) or not isinstance(canvas_data.get('elements'), list):
+        return canvas_data
+    return {**canvas_data, 'elements': [normalize_element(element) for element in canvas_data['elements']]}
+
+
+def validate_canvas_data(canvas_data):
+    """Check a canvas document against ELEMENT_SCHEMAS, raising CanvasValidationError"""
+    if not isinstance(canvas_data, dict):
+        raise CanvasValidationError('canvas_data', 'must be an object')
+    if set(canvas_data) - {'elements'}:
+        raise CanvasValidationError('canvas_data', 'only "elements" is allowed')
+
+    elements = canvas_data.get('elements', [])
+    if not isinstance(elements, list):
+        raise CanvasValidationError('canvas_data.elements', 'must be a list')
+    limit = max_elements()
+    if len(elements) > limit:
+        raise CanvasValidationError('canvas_data.elements', f'must contain at most {limit} elements')
+
+    for index, element in enumerate(elements):
+        validate_element(element, f'canvas_data.elements[{index}]')
+
+
+def validate_element(element, path='element'):
+    """Check a single canvas element against its type's schema"""
+    if not isinstance(element, dict):
+        raise CanvasValidationError(path, 'must be an object')
+
+    schema = _COMPILED_SCHEMAS.get(element.get('type'))
+    if schema is None:
+        raise CanvasValidationError(f'{path}.type', f'must be one of {", ".join(ELEMENT_SCHEMAS)}')
+    required, allowed = schema
+
+    for name in required:
+        if name not in element:
+            raise CanvasValidationError(f'{path}.{name}', 'is required')
+    for name, value in element.items():
+        if name == 'type':
+            continue
+        check = allowed.get(name)
+        if check is None:
+            raise CanvasValidationError(f'{path}.{name}', 'is not an allowed field')
+        check(value, f'{path}.{name}')
+
+
+def validate_save_design_payload(data):
+    """Validate the whole save_design body, raising CanvasValidationError"""
+    if not isinstance(data, dict):
+        raise CanvasValidationError('body', 'must be a JSON object')
+
+    design_name = data.get('design_name')
+    if not isinstance(design_name, str) or not design_name.strip():
+        raise CanvasValidationError('design_name', 'is required')
+    if len(design_name) > MAX_DESIGN_NAME_LENGTH:
+        raise CanvasValidationError('design_name', f'must be at most {MAX_DESIGN_NAME_LENGTH} characters')
+
+    for name in ('template_id', 'design_id'):
+        value = data.get(name)
+        if name == 'design_id' and value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit():
+            raise CanvasValidationError(name, 'must be an integer id')
+
+    preview_image = data.get('preview_image')
+    if preview_image is not None:
+        if not isinstance(preview_image, str) or not PREVIEW_IMAGE_RE.match(preview_image):
+            raise CanvasValidationError('preview_image', 'must be a base64 PNG, JPEG or WebP data URL')
+        if len(preview_image) > max_preview_image_length():
+            raise CanvasValidationError('preview_image', 'is too large')
+
+    validate_canvas_data(data.get('canvas_data'))
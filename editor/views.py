@@ -1,33 +1,61 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from .models import Template, UserDesign, UserUploadedImage, TemplateCategory
+from .exports import export_filename, iter_ndjson, iter_tarball
 from .forms import TemplateUploadForm, UserImageUploadForm
+from .sharing import ensure_share_image, make_share_token, read_share_token
+from .storage import (
+    DIRECT_UPLOAD_PREFIXES, DirectUploadError, build_upload_name, direct_uploads_enabled,
+    presign_post, upload_belongs_to, verify_upload,
+)
+from .validators import CanvasValidationError, max_save_design_bytes, validate_save_design_payload
 import json
 import base64
+import binascii
+import time
 from django.core.files.base import ContentFile
 
+# ?sort= value -> ordering, each backed by an index on Template
+TEMPLATE_SORTS = {
+    'newest': ['-created_at'],
+    'popular': ['-use_count', '-created_at'],
+    'trending': ['-recent_use_count', '-created_at'],
+}
+
+
 def template_list(request):
-    """Display all available templates with category filter"""
+    """Display all available templates with category filter and sort order"""
     category_id = request.GET.get('category')
+    sort = request.GET.get('sort')
+    if sort not in TEMPLATE_SORTS:
+        sort = 'newest'
+    ordering = TEMPLATE_SORTS[sort]
     
     # Get all categories that have templates
     categories = TemplateCategory.objects.filter(templates__isnull=False).distinct()
     
     # Filter templates
     if category_id:
-        admin_templates = Template.objects.filter(is_admin_template=True, category_id=category_id)
+        admin_templates = Template.objects.filter(is_admin_template=True, category_id=category_id).order_by(*ordering)
         user_templates = Template.objects.filter(
             uploaded_by=request.user, 
             category_id=category_id
-        ) if request.user.is_authenticated else []
+        ).order_by(*ordering) if request.user.is_authenticated else []
         selected_category = get_object_or_404(TemplateCategory, id=category_id)
     else:
-        admin_templates = Template.objects.filter(is_admin_template=True)
+        admin_templates = Template.objects.filter(is_admin_template=True).order_by(*ordering)
         user_templates = Template.objects.filter(
             uploaded_by=request.user
-        ) if request.user.is_authenticated else []
+        ).order_by(*ordering) if request.user.is_authenticated else []
         selected_category = None
     
     context = {
@@ -35,6 +63,7 @@ def template_list(request):
         'user_templates': user_templates,
         'categories': categories,
         'selected_category': selected_category,
+        'sort': sort,
     }
     return render(request, 'editor/template_list.html', context)
 
@@ -63,6 +92,7 @@ def template_upload(request):
             elif select_category:
                 template.category = select_category
             
+            template.read_image_dimensions()
             template.save()
             messages.success(request, 'Template uploaded successfully!')
             return redirect('template_list')
@@ -72,17 +102,68 @@ def template_upload(request):
     return render(request, 'editor/template_upload.html', {'form': form})
 
 
+def _editor_bootstrap(template, design=None):
+    """Build the payload the editor needs to become interactive without extra requests"""
+    element_images = []
+    if design and isinstance(design.canvas_data, dict):
+        for element in design.canvas_data.get('elements') or []:
+            url = element.get('image') if isinstance(element, dict) else None
+            if isinstance(url, str) and not url.startswith('data:') and url not in element_images:
+                element_images.append(url)
+
+    return {
+        'template': {
+            'id': template.id,
+            'image_url': template.image.url,
+            # Stored on save, so remote storage is never read here
+            'width': template.image_width,
+            'height': template.image_height,
+        },
+        'design': {
+            'id': design.id,
+            'design_name': design.design_name,
+            'canvas_data': design.canvas_data,
+        } if design else None,
+        'element_images': element_images,
+    }
+
+
 @login_required
-def editor_view(request, template_id):
-    """Main editor view"""
+def editor_view(request, template_id, design_id=None):
+    """Main editor view, optionally preloaded with a saved design"""
     template = get_object_or_404(Template, id=template_id)
     user_images = UserUploadedImage.objects.filter(user=request.user)
-    
+
+    # Older links pass the design as ?design_id=<id>
+    if design_id is None and request.GET.get('design_id', '').isdigit():
+        design_id = int(request.GET['design_id'])
+
+    design = None
+    if design_id is not None:
+        design = get_object_or_404(UserDesign, id=design_id, user=request.user)
+        # A design is only ever edited over its own template; saves never move it to another one
+        if design.template_id is None:
+            raise Http404('This design has no template')
+        if design.template_id != template.id:
+            return redirect('editor_design', template_id=design.template_id, design_id=design.id)
+
+    bootstrap = _editor_bootstrap(template, design)
     context = {
         'template': template,
         'user_images': user_images,
+        'design': design,
+        'editor_bootstrap': bootstrap,
+        'direct_uploads_enabled': direct_uploads_enabled(),
     }
-    return render(request, 'editor/editor.html', context)
+    response = render(request, 'editor/editor.html', context)
+
+    # Only template-level assets go in the Link header: it is replayed as
+    # 103 Early Hints for every user opening this template (see early_hints.py)
+    response['Link'] = ', '.join([
+        f'<{template.image.url}>; rel=preload; as=image; crossorigin=anonymous',
+        f'<{static("editor/js/canvas-editor.js")}>; rel=preload; as=script',
+    ])
+    return response
 
 
 @login_required
@@ -102,51 +183,159 @@ def upload_user_image(request):
     return JsonResponse({'success': False, 'error': 'No image provided'})
 
 
+@login_required
+def presign_upload(request):
+    """Issue a presigned POST so the browser can upload an image straight to object storage"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=405)
+    if not direct_uploads_enabled():
+        return JsonResponse({'success': False, 'error': 'Direct uploads are not enabled'}, status=404)
+
+    try:
+        data = json.loads(request.body)
+        kind = data.get('kind', 'user_image')
+        name = build_upload_name(kind, request.user, data.get('filename'))
+        upload = presign_post(name, str(data.get('content_type', '')))
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Request body is not valid JSON'}, status=400)
+    except DirectUploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({'success': True, 'key': name, 'url': upload['url'], 'fields': upload['fields']})
+
+
+@login_required
+def complete_upload(request):
+    """Record a directly uploaded image after a HEAD check; templates may include the measured width/height"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=405)
+    if not direct_uploads_enabled():
+        return JsonResponse({'success': False, 'error': 'Direct uploads are not enabled'}, status=404)
+
+    try:
+        data = json.loads(request.body)
+        kind = data.get('kind', 'user_image')
+        name = data.get('key')
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Request body is not valid JSON'}, status=400)
+    if not isinstance(kind, str) or not isinstance(name, str):
+        return JsonResponse({'success': False, 'error': 'kind and key must be strings'}, status=400)
+    if kind not in DIRECT_UPLOAD_PREFIXES or not upload_belongs_to(name, kind, request.user):
+        return JsonResponse({'success': False, 'error': 'Invalid upload key'}, status=403)
+
+    try:
+        verify_upload(name)
+    except DirectUploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    if kind == 'template':
+        template_name = str(data.get('name') or '').strip()[:200]
+        if not template_name:
+            return JsonResponse({'success': False, 'error': 'Template name is required'}, status=400)
+        category = None
+        category_name = str(data.get('category') or '').strip()[:100]
+        if category_name:
+            category, created = TemplateCategory.objects.get_or_create(
+                name=category_name,
+                defaults={'created_by': request.user}
+            )
+        # The object is never downloaded here, so dimensions are what the browser measured
+        width, height = data.get('width'), data.get('height')
+        if not all(type(value) is int and 0 < value <= 100000 for value in (width, height)):
+            width = height = None
+        template = Template.objects.create(
+            name=template_name,
+            image=name,
+            image_width=width,
+            image_height=height,
+            category=category,
+            uploaded_by=request.user,
+            is_admin_template=request.user.is_staff,
+        )
+        return JsonResponse({'success': True, 'template_id': template.id, 'image_url': template.image.url})
+
+    user_image = UserUploadedImage.objects.create(user=request.user, image=name)
+    return JsonResponse({
+        'success': True,
+        'image_url': user_image.image.url,
+        'image_id': user_image.id
+    })
+
+
 @login_required
 def save_design(request):
     """Save user's canvas design"""
-    if request.method == 'POST':
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=405)
+
+    limit = max_save_design_bytes()
+
+    # Reject oversized bodies from the declared length, before reading or parsing them
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > limit:
+        return JsonResponse({'success': False, 'error': 'Design payload is too large'}, status=413)
+
+    # Chunked bodies declare no length, so never read more than the limit allows
+    body = request.read(limit + 1)
+    if len(body) > limit:
+        return JsonResponse({'success': False, 'error': 'Design payload is too large'}, status=413)
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Request body is not valid JSON'}, status=400)
+
+    try:
+        validate_save_design_payload(data)
+    except CanvasValidationError as e:
+        return JsonResponse({'success': False, 'error': str(e), 'field': e.path}, status=400)
+
+    design_name = data['design_name']
+    canvas_data = data['canvas_data']
+    preview_image_data = data.get('preview_image')
+    design_id = data.get('design_id')
+
+    try:
+        template = Template.objects.get(id=data['template_id'])
+    except Template.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Template not found'}, status=404)
+
+    # Update existing or create new
+    if design_id:
         try:
-            data = json.loads(request.body)
-            design_name = data.get('design_name')
-            canvas_data = data.get('canvas_data')
-            template_id = data.get('template_id')
-            preview_image_data = data.get('preview_image')
-            design_id = data.get('design_id')
-            
-            template = Template.objects.get(id=template_id)
-            
-            # Update existing or create new
-            if design_id:
-                design = UserDesign.objects.get(id=design_id, user=request.user)
-                design.design_name = design_name
-                design.canvas_data = canvas_data
-            else:
-                design = UserDesign(
-                    user=request.user,
-                    template=template,
-                    design_name=design_name,
-                    canvas_data=canvas_data
-                )
-            
-            # Save preview image if provided
-            if preview_image_data:
-                format, imgstr = preview_image_data.split(';base64,')
-                ext = format.split('/')[-1]
-                data_file = ContentFile(base64.b64decode(imgstr), name=f'{design_name}.{ext}')
-                design.preview_image = data_file
-            
-            design.save()
-            
-            return JsonResponse({
-                'success': True,
-                'design_id': design.id,
-                'message': 'Design saved successfully!'
-            })
-        except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)})
-    
-    return JsonResponse({'success': False, 'error': 'Invalid request'})
+            design = UserDesign.objects.get(id=design_id, user=request.user)
+        except UserDesign.DoesNotExist:
+            return JsonResponse({'success': False, 'error': 'Design not found'}, status=404)
+        design.design_name = design_name
+        design.canvas_data = canvas_data
+    else:
+        design = UserDesign(
+            user=request.user,
+            template=template,
+            design_name=design_name,
+            canvas_data=canvas_data
+        )
+
+    # Save preview image if provided
+    if preview_image_data:
+        format, imgstr = preview_image_data.split(';base64,', 1)
+        ext = format.split('/')[-1]
+        try:
+            image_bytes = base64.b64decode(imgstr, validate=True)
+        except binascii.Error:
+            return JsonResponse({'success': False, 'error': 'preview_image: invalid base64 data', 'field': 'preview_image'}, status=400)
+        design.preview_image = ContentFile(image_bytes, name=f'{design_name}.{ext}')
+
+    design.save()
+
+    return JsonResponse({
+        'success': True,
+        'design_id': design.id,
+        'message': 'Design saved successfully!'
+    })
 
 
 @login_required
@@ -160,6 +349,86 @@ def my_designs(request):
     return render(request, 'editor/my_designs.html', {'designs': designs})
 
 
+@login_required
+def export_designs(request):
+    """Stream the user's designs as NDJSON, or as a .tar.gz with their media when ?media=1"""
+    designs = UserDesign.objects.filter(user=request.user)
+    if request.GET.get('media'):
+        response = StreamingHttpResponse(iter_tarball(designs), content_type='application/gzip')
+        filename = export_filename('tar.gz')
+    else:
+        response = StreamingHttpResponse(iter_ndjson(designs), content_type='application/x-ndjson')
+        filename = export_filename('ndjson')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def share_design(request, design_id):
+    """Create a signed public link to one of the user's designs"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=405)
+    design = get_object_or_404(UserDesign, id=design_id, user=request.user)
+
+    try:
+        days = int(request.POST.get('expires_in_days') or 0)
+    except ValueError:
+        days = -1
+    if days < 0:
+        return JsonResponse({'success': False, 'error': 'expires_in_days must be a whole number, 0 for no expiry'}, status=400)
+
+    token = make_share_token(design, expires_in=days * 86400 if days else None)
+    return JsonResponse({
+        'success': True,
+        'share_url': request.build_absolute_uri(reverse('shared_design', args=[token])),
+    })
+
+
+def _get_shared_design(token):
+    try:
+        design_id, expires_at = read_share_token(token)
+    except signing.BadSignature:
+        raise Http404('Invalid or expired share link')
+    design = get_object_or_404(UserDesign.objects.select_related('template'), id=design_id)
+    return design, expires_at
+
+
+def _cache_shared_response(response, design, expires_at):
+    max_age = settings.SHARE_LINK_CACHE_SECONDS
+    if expires_at is not None:
+        max_age = max(0, min(max_age, int(expires_at - time.time())))
+    patch_cache_control(response, public=True, max_age=max_age)
+    response['Last-Modified'] = http_date(design.updated_at.timestamp())
+    return response
+
+
+def shared_design(request, token):
+    """Public page for a shared design, with Open Graph tags pointing at the rendered image"""
+    design, expires_at = _get_shared_design(token)
+
+    not_modified = get_conditional_response(request, last_modified=int(design.updated_at.timestamp()))
+    if not_modified is not None:
+        return _cache_shared_response(not_modified, design, expires_at)
+
+    image_name = ensure_share_image(design)
+    context = {
+        'design': design,
+        'image_url': request.build_absolute_uri(default_storage.url(image_name)) if image_name else None,
+        'page_url': request.build_absolute_uri(),
+    }
+    response = render(request, 'editor/share.html', context)
+    return _cache_shared_response(response, design, expires_at)
+
+
+def shared_design_image(request, token):
+    """Redirect to the rendered share image, rendering it on the first hit for this design version"""
+    design, expires_at = _get_shared_design(token)
+    image_name = ensure_share_image(design)
+    if not image_name:
+        raise Http404('This design has no image')
+    return _cache_shared_response(redirect(default_storage.url(image_name)), design, expires_at)
+
+
 @login_required
 def load_design(request, design_id):
     """Load a saved design for editing"""
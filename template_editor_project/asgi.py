@@ -2,6 +2,8 @@
 ASGI config for template_editor_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections go to the collaborative
+editing consumer in editor/collab.py.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -11,6 +13,19 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from editor.early_hints import EarlyHintsMiddleware
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'template_editor_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from editor.collab import CollaborationConsumer  # noqa: E402  (needs the app registry)
+
+http_application = EarlyHintsMiddleware(django_application)
+collaboration_application = CollaborationConsumer()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await collaboration_application(scope, receive, send)
+    return await http_application(scope, receive, send)